@@ -0,0 +1,105 @@
+"""
+SwapPilot Telegram Landing Bot — UI microbenchmark
+Compares building keyboards/messages per request (previous handlers) with the
+pre-rendered lookups from `ui.py`.
+
+Usage:
+  python bench_ui.py
+  python bench_ui.py --number 200000
+"""
+
+import argparse
+import timeit
+from typing import Callable, Optional
+
+from ui import build_ui
+
+CHANNEL_LINK = "https://t.me/SwapPilot_Official"
+GROUP_LINK = "https://t.me/SwapPilot_Community"
+
+
+# ─── Per-request rendering (what the handlers used to do) ─────────────
+def group_url() -> Optional[str]:
+    return GROUP_LINK
+
+
+def build_keyboard_per_request(stage: str = "landing"):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+    buttons = []
+    buttons.append([InlineKeyboardButton("✅ Join the official channel", callback_data="go_channel")])
+    if group_url():
+        buttons.append([InlineKeyboardButton("💬 Join the community group", callback_data="go_group")])
+    buttons.append([InlineKeyboardButton("🔎 Verify access", callback_data="verify")])
+    return InlineKeyboardMarkup(buttons)
+
+
+def verify_text_per_request(ok_channel: bool, ok_group: Optional[bool]) -> str:
+    msg = "Verification result:\n"
+    msg += f"- Channel: {'✅' if ok_channel else '❌'}\n"
+    msg += f"- Group: {'✅' if ok_group else '❌'}\n"
+    if not ok_channel:
+        msg += "\nTo access updates, you must join the official channel first."
+    msg += "\n\nIf you just joined, wait 5–10 seconds and try again."
+    return msg
+
+
+def group_link_text_per_request() -> str:
+    return f"Join the community group here:\n{group_url()}\n\nThen come back and tap Verify."
+
+
+# ─── Runner ───────────────────────────────────────────────────────────
+def bench(name: str, fn: Callable[[], object], number: int) -> float:
+    fn()  # warm-up (first telegram import, caches)
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    per_call_us = best / number * 1e6
+    print(f"  {name:<44} {per_call_us:8.3f} µs/call")
+    return per_call_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SwapPilot bot UI microbenchmark")
+    parser.add_argument("--number", type=int, default=50_000, help="Calls per timing run (best of 5)")
+    args = parser.parse_args()
+
+    ui = build_ui(
+        channel_link=CHANNEL_LINK,
+        group_link=GROUP_LINK,
+        group_verifiable=True,
+        group_invite=False,
+        campaign_versions={"ads_tg_01": "v1"},
+    )
+
+    cases = [
+        (
+            "keyboard",
+            lambda: build_keyboard_per_request("landing"),
+            lambda: ui.keyboard("landing"),
+        ),
+        (
+            "verify message + keyboard",
+            lambda: (verify_text_per_request(False, True), build_keyboard_per_request("landing")),
+            lambda: (ui.verify_text(False, True), ui.keyboard("landing")),
+        ),
+        (
+            "group link message + keyboard",
+            lambda: (group_link_text_per_request(), build_keyboard_per_request("after_link")),
+            lambda: (ui.group_link_text, ui.keyboard("after_link")),
+        ),
+        (
+            "landing variant (campaign / A/B)",
+            lambda: ("v1", build_keyboard_per_request("landing")),
+            lambda: (ui.landing(12345, "ads_tg_01"), ui.landing(12346, "")),
+        ),
+    ]
+
+    print(f"Best of 5 runs x {args.number} calls\n")
+    for name, before, after in cases:
+        print(name)
+        t_before = bench("per request", before, args.number)
+        t_after = bench("pre-rendered (ui.py)", after, args.number)
+        print(f"  {'speedup':<44} {t_before / t_after:8.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
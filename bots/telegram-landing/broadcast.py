@@ -0,0 +1,511 @@
+"""
+SwapPilot Telegram Landing Bot — Broadcast
+Re-engages users from `user_state` (everyone who pressed /start).
+
+- Recipients are streamed from `user_state` in `user_id` order (keyset pages), optionally
+  filtered by campaign (`last_start_param`) and last-seen window.
+- An async worker pool sends through a global token bucket (Telegram: ~30 msg/s) and a
+  per-chat bucket (~1 msg/s), pauses everyone on 429 `retry_after`, and retries network errors.
+- Outcomes go to `broadcast_deliveries` in batched writes; the page cursor is checkpointed in
+  `broadcasts`, so `--resume ID` continues after a crash without re-sending logged deliveries.
+
+Usage:
+  python broadcast.py --text "SwapPilot v2 is live" --campaign ads_tg_01 --seen-within-days 30
+  python broadcast.py --text-file message.html --parse-mode HTML --dry-run
+  python broadcast.py --resume 3
+  python broadcast.py --list
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from ratelimit import KeyedRateLimiter, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+# ─── Config ───────────────────────────────────────────────────────────
+GLOBAL_RATE_PER_SEC = 25.0  # Telegram allows ~30 msg/s for bulk notifications; keep headroom
+GLOBAL_BURST = 25.0
+PER_CHAT_RATE_PER_SEC = 1.0
+PAGE_SIZE = 500
+FLUSH_EVERY = 100
+MAX_RETRIES = 5
+
+STATUS_SENT = "sent"
+STATUS_BLOCKED = "blocked"  # user blocked the bot / deactivated: don't retry
+STATUS_FAILED = "failed"
+
+
+# ─── Schema ───────────────────────────────────────────────────────────
+SCHEMA = (
+    """
+CREATE TABLE IF NOT EXISTS broadcasts (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  text TEXT,
+  parse_mode TEXT,
+  filters TEXT,
+  status TEXT,
+  cursor_user_id INTEGER,
+  created_ts INTEGER,
+  updated_ts INTEGER
+)
+""",
+    """
+CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+  broadcast_id INTEGER,
+  user_id INTEGER,
+  status TEXT,
+  error TEXT,
+  ts INTEGER,
+  PRIMARY KEY (broadcast_id, user_id)
+)
+""",
+)
+
+
+def init_broadcast_tables(conn: sqlite3.Connection) -> None:
+    with conn:
+        for sql in SCHEMA:
+            conn.execute(sql)
+
+
+# ─── Recipients ───────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class Filters:
+    campaign: Optional[str] = None  # exact `last_start_param` ('' = organic)
+    seen_after_ts: Optional[int] = None
+    seen_before_ts: Optional[int] = None
+
+    def where(self) -> tuple[str, list[Any]]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        if self.campaign is not None:
+            clauses.append("COALESCE(last_start_param, '') = ?")
+            params.append(self.campaign)
+        if self.seen_after_ts is not None:
+            clauses.append("last_seen_ts >= ?")
+            params.append(self.seen_after_ts)
+        if self.seen_before_ts is not None:
+            clauses.append("last_seen_ts < ?")
+            params.append(self.seen_before_ts)
+        return (" AND " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_recipient_pages(
+    conn: sqlite3.Connection, filters: Filters, after_user_id: int, page_size: int = PAGE_SIZE
+) -> Iterator[list[int]]:
+    """Yield pages of user ids > `after_user_id` in ascending order, without loading the whole table."""
+    where, params = filters.where()
+    cursor = after_user_id
+    while True:
+        rows = conn.execute(
+            f"SELECT user_id FROM user_state WHERE user_id > ?{where} ORDER BY user_id LIMIT ?",
+            (cursor, *params, page_size),
+        ).fetchall()
+        if not rows:
+            return
+        page = [r[0] for r in rows]
+        yield page
+        cursor = page[-1]
+
+
+# ─── Broadcast records ────────────────────────────────────────────────
+@dataclass(frozen=True)
+class Broadcast:
+    id: int
+    text: str
+    parse_mode: Optional[str]
+    filters: Filters
+    status: str
+    cursor_user_id: int
+
+
+def create_broadcast(conn: sqlite3.Connection, text: str, parse_mode: Optional[str], filters: Filters) -> Broadcast:
+    now = int(time.time())
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO broadcasts(text, parse_mode, filters, status, cursor_user_id, created_ts, updated_ts) "
+            "VALUES (?,?,?,?,?,?,?)",
+            (text, parse_mode, json.dumps(asdict(filters)), "running", 0, now, now),
+        )
+    return load_broadcast(conn, int(cur.lastrowid))
+
+
+def load_broadcast(conn: sqlite3.Connection, broadcast_id: int) -> Broadcast:
+    row = conn.execute(
+        "SELECT id, text, parse_mode, filters, status, cursor_user_id FROM broadcasts WHERE id=?", (broadcast_id,)
+    ).fetchone()
+    if row is None:
+        raise RuntimeError(f"Broadcast #{broadcast_id} not found")
+    return Broadcast(
+        id=row[0],
+        text=row[1],
+        parse_mode=row[2],
+        filters=Filters(**json.loads(row[3] or "{}")),
+        status=row[4],
+        cursor_user_id=row[5],
+    )
+
+
+class DeliveryLog:
+    """Buffers delivery outcomes and writes them (plus the checkpoint) in one transaction."""
+
+    def __init__(self, conn: sqlite3.Connection, broadcast_id: int, flush_every: int = FLUSH_EVERY):
+        self.conn = conn
+        self.broadcast_id = broadcast_id
+        self.flush_every = flush_every
+        self._rows: list[tuple[int, int, str, Optional[str], int]] = []
+
+    def add(self, user_id: int, status: str, error: Optional[str]) -> None:
+        self._rows.append((self.broadcast_id, user_id, status, error, int(time.time())))
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self, cursor_user_id: Optional[int] = None, status: Optional[str] = None) -> None:
+        rows, self._rows = self._rows, []
+        with self.conn:
+            if rows:
+                self.conn.executemany("INSERT OR REPLACE INTO broadcast_deliveries VALUES (?,?,?,?,?)", rows)
+            if cursor_user_id is not None or status is not None:
+                self.conn.execute(
+                    "UPDATE broadcasts SET cursor_user_id=COALESCE(?, cursor_user_id), "
+                    "status=COALESCE(?, status), updated_ts=? WHERE id=?",
+                    (cursor_user_id, status, int(time.time()), self.broadcast_id),
+                )
+
+    def already_delivered(self, first_user_id: int, last_user_id: int) -> set[int]:
+        """Users of this page logged before a crash (the page cursor had not been saved yet)."""
+        rows = self.conn.execute(
+            "SELECT user_id FROM broadcast_deliveries WHERE broadcast_id=? AND user_id BETWEEN ? AND ?",
+            (self.broadcast_id, first_user_id, last_user_id),
+        ).fetchall()
+        return {r[0] for r in rows}
+
+
+# ─── Sender ───────────────────────────────────────────────────────────
+@dataclass
+class BroadcastStats:
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    skipped: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+
+
+def _retry_after_seconds(e: Exception) -> float:
+    ra = getattr(e, "retry_after", 1)
+    # PTB 22 may expose retry_after as int or timedelta
+    return float(ra.total_seconds()) if hasattr(ra, "total_seconds") else float(ra)
+
+
+class Broadcaster:
+    """
+    Sends one broadcast through `bot.send_message`. `bot` can be a real `telegram.Bot` or any
+    fake exposing `async send_message(chat_id, text, **kwargs)` that raises `telegram.error` types.
+    """
+
+    def __init__(
+        self,
+        bot,
+        conn: sqlite3.Connection,
+        broadcast: Broadcast,
+        workers: int = 8,
+        global_rate: float = GLOBAL_RATE_PER_SEC,
+        global_burst: float = GLOBAL_BURST,
+        per_chat_rate: float = PER_CHAT_RATE_PER_SEC,
+        max_retries: int = MAX_RETRIES,
+        page_size: int = PAGE_SIZE,
+        flush_every: int = FLUSH_EVERY,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.bot = bot
+        self.conn = conn
+        self.broadcast = broadcast
+        self.workers = workers
+        self.max_retries = max_retries
+        self.page_size = page_size
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock=clock)
+        self.chat_limiter: KeyedRateLimiter[int] = KeyedRateLimiter(per_chat_rate, 1, max_keys=10_000, clock=clock)
+        self.log = DeliveryLog(conn, broadcast.id, flush_every=flush_every)
+        self.stats = BroadcastStats()
+        self._paused_until = 0.0
+
+    async def _acquire(self, chat_id: int) -> None:
+        """Wait for a 429 pause to end, then for both the per-chat and the global bucket."""
+        while True:
+            wait = max(
+                self._paused_until - self.clock(),
+                self.chat_limiter.delay(chat_id),
+                self.global_bucket.delay(),
+            )
+            if wait <= 0:
+                # No await since the checks above, so both buckets still have a token.
+                self.chat_limiter.allow(chat_id)
+                self.global_bucket.allow()
+                return
+            await self.sleep(wait)
+
+    async def _send(self, user_id: int) -> tuple[str, Optional[str]]:
+        from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+        attempt = 0
+        while True:
+            await self._acquire(user_id)
+            try:
+                await self.bot.send_message(
+                    chat_id=user_id, text=self.broadcast.text, parse_mode=self.broadcast.parse_mode
+                )
+                return STATUS_SENT, None
+            except RetryAfter as e:
+                # Flood control applies to the whole bot: pause every worker, then retry this chat.
+                self.stats.rate_limited += 1
+                self._paused_until = max(self._paused_until, self.clock() + _retry_after_seconds(e))
+                logger.warning("429 from Telegram, pausing %.1fs", _retry_after_seconds(e))
+                continue
+            except Forbidden as e:
+                return STATUS_BLOCKED, str(e)
+            except BadRequest as e:
+                return STATUS_FAILED, str(e)
+            except NetworkError as e:  # includes TimedOut
+                attempt += 1
+                if attempt > self.max_retries:
+                    return STATUS_FAILED, str(e)
+                self.stats.retries += 1
+                await self.sleep(min(30.0, 0.5 * 2 ** (attempt - 1)))
+            except Exception as e:
+                return STATUS_FAILED, f"{type(e).__name__}: {e}"
+
+    def _record(self, user_id: int, status: str, error: Optional[str]) -> None:
+        if status == STATUS_SENT:
+            self.stats.sent += 1
+        elif status == STATUS_BLOCKED:
+            self.stats.blocked += 1
+        else:
+            self.stats.failed += 1
+            key = (error or "").split(":", 1)[0][:60]
+            self.stats.errors[key] = self.stats.errors.get(key, 0) + 1
+        self.log.add(user_id, status, error)
+
+    async def run(self, progress: Optional[Callable[[BroadcastStats], None]] = None) -> BroadcastStats:
+        queue: asyncio.Queue[int] = asyncio.Queue(maxsize=self.page_size)
+
+        async def worker() -> None:
+            while True:
+                user_id = await queue.get()
+                try:
+                    status, error = await self._send(user_id)
+                    self._record(user_id, status, error)
+                finally:
+                    queue.task_done()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            pages = iter_recipient_pages(
+                self.conn, self.broadcast.filters, self.broadcast.cursor_user_id, self.page_size
+            )
+            for page in pages:
+                done = self.log.already_delivered(page[0], page[-1])
+                self.stats.skipped += len(done)
+                for user_id in page:
+                    if user_id not in done:
+                        await queue.put(user_id)
+                await queue.join()
+                # Every recipient up to page[-1] is logged: checkpoint in the same transaction.
+                self.log.flush(cursor_user_id=page[-1])
+                if progress is not None:
+                    progress(self.stats)
+            self.log.flush(status="done")
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.log.flush()
+        return self.stats
+
+
+class DryRunBot:
+    """Fake Bot for `--dry-run`: accepts every message after a small simulated latency."""
+
+    def __init__(self, latency_s: float = 0.02):
+        self.latency_s = latency_s
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency_s)
+        self.sent += 1
+        return True
+
+
+def open_dry_run_db(db_path: str) -> sqlite3.Connection:
+    """
+    In-memory copy of `user_state` (read through a read-only connection) for `--dry-run`:
+    the run creates its broadcast, deliveries and checkpoints there, so the real database
+    is never written.
+    """
+    if not Path(db_path).exists():
+        raise FileNotFoundError(f"Database not found: {db_path}")
+    mem = sqlite3.connect(":memory:")
+    mem.execute("ATTACH DATABASE ? AS src", (f"{Path(db_path).resolve().as_uri()}?mode=ro",))
+    row = mem.execute("SELECT sql FROM src.sqlite_master WHERE type='table' AND name='user_state'").fetchone()
+    if row is None:
+        raise RuntimeError(f"No user_state table in {db_path}")
+    with mem:
+        mem.execute(row[0])
+        mem.execute("INSERT INTO main.user_state SELECT * FROM src.user_state")
+    mem.execute("DETACH DATABASE src")
+    init_broadcast_tables(mem)
+    return mem
+
+
+# ─── CLI ──────────────────────────────────────────────────────────────
+def list_broadcasts(conn: sqlite3.Connection) -> None:
+    rows = conn.execute(
+        """
+SELECT b.id, b.status, b.created_ts, b.filters,
+  SUM(CASE WHEN d.status='sent' THEN 1 ELSE 0 END),
+  SUM(CASE WHEN d.status='blocked' THEN 1 ELSE 0 END),
+  SUM(CASE WHEN d.status='failed' THEN 1 ELSE 0 END)
+FROM broadcasts b LEFT JOIN broadcast_deliveries d ON d.broadcast_id = b.id
+GROUP BY b.id ORDER BY b.id
+"""
+    ).fetchall()
+    if not rows:
+        print("No broadcasts yet.")
+    for bid, status, created, filters, sent, blocked, failed in rows:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(created))
+        print(
+            f"#{bid} [{status}] {when} sent={sent or 0} blocked={blocked or 0} failed={failed or 0} filters={filters}"
+        )
+
+
+async def run_broadcast(broadcaster: Broadcaster) -> BroadcastStats:
+    t0 = time.perf_counter()
+
+    def progress(s: BroadcastStats) -> None:
+        dt = time.perf_counter() - t0
+        done = s.sent + s.blocked + s.failed
+        print(
+            f"  {done} processed ({done / dt if dt else 0:.1f}/s) | sent={s.sent} blocked={s.blocked} "
+            f"failed={s.failed} skipped={s.skipped} 429s={s.rate_limited}"
+        )
+
+    return await broadcaster.run(progress=progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SwapPilot Telegram landing bot — broadcast to user_state")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--text", help="Message text")
+    src.add_argument("--text-file", help="Read message text from a UTF-8 file")
+    src.add_argument("--resume", type=int, metavar="ID", help="Resume broadcast #ID from its checkpoint")
+    src.add_argument("--list", action="store_true", help="List broadcasts and their delivery counts")
+    parser.add_argument("--parse-mode", choices=["HTML", "MarkdownV2"], help="Telegram parse mode")
+    parser.add_argument("--campaign", help="Only users whose last start_param equals this ('' = organic)")
+    parser.add_argument("--seen-within-days", type=float, help="Only users seen in the last N days")
+    parser.add_argument("--inactive-days", type=float, help="Only users NOT seen for at least N days")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent senders")
+    parser.add_argument("--rate", type=float, default=GLOBAL_RATE_PER_SEC, help="Global messages per second")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Use a fake Bot on an in-memory copy of the recipients (nothing is sent or written)",
+    )
+    parser.add_argument("--db", default="", help="SQLite path (default: DB_PATH from the bot config)")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s | %(levelname)s | %(message)s", level=logging.INFO)
+
+    if args.workers <= 0 or args.rate <= 0:
+        parser.error("--workers and --rate must be > 0")
+    if args.dry_run and (args.resume is not None or args.list):
+        parser.error("--dry-run cannot be combined with --resume or --list")
+
+    from config import get_config
+
+    # The bot config (and its BOT_TOKEN) is only needed to send for real or to find DB_PATH.
+    needs_token = not (args.dry_run or args.list)
+    cfg = get_config() if (needs_token or not args.db) else None
+    db_path = args.db or cfg.db_path
+    if args.dry_run:
+        try:
+            conn = open_dry_run_db(db_path)
+        except (FileNotFoundError, RuntimeError) as e:
+            parser.error(str(e))
+        print(f"Dry run: recipients copied in memory, nothing is written to {db_path}")
+    else:
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA busy_timeout=5000;")
+        init_broadcast_tables(conn)
+
+    if args.list:
+        list_broadcasts(conn)
+        return
+
+    if args.resume is not None:
+        broadcast = load_broadcast(conn, args.resume)
+        if broadcast.status == "done":
+            print(f"Broadcast #{broadcast.id} is already done.")
+            return
+        print(f"Resuming broadcast #{broadcast.id} after user_id {broadcast.cursor_user_id}")
+    else:
+        text = args.text if args.text is not None else Path(args.text_file).read_text(encoding="utf-8")
+        if not text.strip():
+            parser.error("message text is empty")
+        now = int(time.time())
+        filters = Filters(
+            campaign=args.campaign,
+            seen_after_ts=int(now - args.seen_within_days * 86400) if args.seen_within_days else None,
+            seen_before_ts=int(now - args.inactive_days * 86400) if args.inactive_days else None,
+        )
+        broadcast = create_broadcast(conn, text, args.parse_mode, filters)
+        print(f"Created broadcast #{broadcast.id} (filters: {asdict(filters)})")
+
+    async def go() -> BroadcastStats:
+        if args.dry_run:
+            bot = DryRunBot()
+            return await run_broadcast(
+                Broadcaster(bot, conn, broadcast, workers=args.workers, global_rate=args.rate, global_burst=args.rate)
+            )
+        from telegram import Bot
+
+        async with Bot(cfg.bot_token) as bot:
+            return await run_broadcast(
+                Broadcaster(bot, conn, broadcast, workers=args.workers, global_rate=args.rate, global_burst=args.rate)
+            )
+
+    try:
+        stats = asyncio.run(go())
+    except KeyboardInterrupt:
+        if args.dry_run:
+            print("\nInterrupted.")
+        else:
+            print(f"\nInterrupted. Resume with: python broadcast.py --resume {broadcast.id}")
+        return
+    finally:
+        conn.close()
+
+    print(
+        f"\nBroadcast #{broadcast.id} done: sent={stats.sent} blocked={stats.blocked} failed={stats.failed} "
+        f"skipped={stats.skipped} retries={stats.retries} 429s={stats.rate_limited}"
+    )
+    if stats.errors:
+        print(f"Failures by reason: {stats.errors}")
+
+
+if __name__ == "__main__":
+    main()
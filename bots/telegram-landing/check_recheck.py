@@ -0,0 +1,156 @@
+"""
+SwapPilot Telegram Landing Bot — recheck queue self-check
+Runs the `RecheckQueue` / `RecheckScheduler` edge cases against an in-memory SQLite
+database and exits non-zero if any of them breaks:
+
+- a manual verify cancels a job while its batch is in flight
+- a manual verify reschedules a job while its batch is in flight
+- the queue is full (new users dropped, existing users still replaced)
+- `load()` truncates persisted jobs to `max_pending`, keeping the earliest due
+- a batch that keeps raising gives up after `max_attempts`
+
+Usage:
+  python check_recheck.py
+"""
+
+import asyncio
+import itertools
+import logging
+import sqlite3
+import sys
+from dataclasses import replace
+from typing import Callable
+
+from recheck import SCHEMA, RecheckJob, RecheckQueue, RecheckScheduler
+
+
+# ─── Fixtures ─────────────────────────────────────────────────────────
+def make_queue(max_pending: int = 100) -> tuple[RecheckQueue, sqlite3.Connection]:
+    db = sqlite3.connect(":memory:")
+    db.execute(SCHEMA)
+
+    def db_executemany(sql: str, rows: list[tuple]) -> None:
+        db.executemany(sql, rows)
+        db.commit()
+
+    def db_query_all(sql: str, params: tuple = ()) -> list[tuple]:
+        return db.execute(sql, params).fetchall()
+
+    return RecheckQueue(db_executemany, db_query_all, max_pending=max_pending), db
+
+
+def job(user_id: int, due_ts: float = 0.0, attempt: int = 0) -> RecheckJob:
+    return RecheckJob(user_id, user_id, 1, "", attempt, due_ts, 0)
+
+
+def rows(db: sqlite3.Connection) -> dict[int, tuple]:
+    """user_id -> (attempt, due_ts) as persisted."""
+    return {r[0]: (r[1], r[2]) for r in db.execute("SELECT user_id, attempt, due_ts FROM recheck_jobs")}
+
+
+# ─── Cases ────────────────────────────────────────────────────────────
+def case_cancel_in_flight() -> None:
+    q, db = make_queue()
+    q.schedule(job(1))
+    (popped,) = q.pop_due(now=1.0, limit=10)
+    q.cancel(1)  # manual verify confirmed while get_chat_member was awaited
+    assert q.superseded(1), "cancelled in-flight job should be superseded"
+    assert rows(db) == {}, "cancel must delete the row even while the job is in flight"
+    q.finish(done=(), retry=[replace(popped, attempt=1, due_ts=5.0)])
+    assert len(q) == 0 and 1 not in q, "batch retry must not resurrect a cancelled job"
+    assert rows(db) == {}, "batch retry must not re-persist a cancelled job"
+    assert q.next_due() is None
+    assert not q.superseded(1), "in-flight bookkeeping must be cleared by finish()"
+
+
+def case_reschedule_in_flight() -> None:
+    q, db = make_queue()
+    q.schedule(job(1))
+    (popped,) = q.pop_due(now=1.0, limit=10)
+    q.schedule(job(1, due_ts=50.0))  # manual verify, still negative: fresh job
+    assert q.superseded(1)
+    # The batch's own retry loses to the newer job...
+    q.finish(done=(), retry=[replace(popped, attempt=1, due_ts=5.0)])
+    assert q.get(1) == job(1, due_ts=50.0), "newer manual job must win over the batch retry"
+    assert rows(db) == {1: (0, 50.0)}
+    # ...and so does a batch that finished the old job.
+    q.schedule(job(2))
+    q.pop_due(now=1.0, limit=10)
+    q.schedule(job(2, due_ts=60.0))
+    q.finish(done=[2], retry=())
+    assert q.get(2) == job(2, due_ts=60.0) and rows(db)[2] == (0, 60.0), "done must not delete the newer job"
+    assert q.next_due() == 50.0
+
+
+def case_full_queue() -> None:
+    q, db = make_queue(max_pending=2)
+    assert q.schedule(job(1, due_ts=10.0)) and q.schedule(job(2, due_ts=20.0))
+    assert not q.schedule(job(3)), "a new user must be dropped when the queue is full"
+    assert 3 not in q and 3 not in rows(db)
+    assert q.schedule(job(1, due_ts=5.0)), "an existing user must still be replaceable when full"
+    assert len(q) == 2 and rows(db)[1] == (0, 5.0)
+    assert q.next_due() == 5.0, "the replaced heap entry must be skipped as stale"
+
+
+def case_load_truncates() -> None:
+    q, db = make_queue(max_pending=100)
+    for user_id, due in ((1, 40.0), (2, 10.0), (3, 30.0), (4, 20.0), (5, 50.0)):
+        q.schedule(job(user_id, due_ts=due))
+    restarted = RecheckQueue(q._db_executemany, q._db_query_all, max_pending=3)
+    assert restarted.load() == 3
+    assert sorted(rows(db)) == [2, 3, 4], "load() must keep the earliest-due jobs and delete the rest"
+    assert [j.user_id for j in restarted.pop_due(now=100.0, limit=10)] == [2, 4, 3], "pop_due must follow due order"
+
+
+def case_failing_batch_gives_up() -> None:
+    q, db = make_queue()
+    q.schedule(job(1))
+    attempts: list[int] = []
+
+    async def boom(jobs: list[RecheckJob]) -> None:
+        attempts.extend(j.attempt for j in jobs)
+        raise RuntimeError("simulated batch failure")
+
+    ticks = itertools.count(0, 100)  # each clock read jumps past the 30 s retry delay
+    scheduler = RecheckScheduler(q, boom, max_attempts=3, clock=lambda: float(next(ticks)))
+
+    async def run() -> None:
+        task = asyncio.create_task(scheduler.run())
+        for _ in range(100):
+            await asyncio.sleep(0)
+            if not len(q):
+                break
+        scheduler.stop()
+        await task
+
+    logging.getLogger("recheck").setLevel(logging.CRITICAL)
+    asyncio.run(run())
+    assert attempts == [0, 1, 2], f"expected attempts 0,1,2 before giving up, got {attempts}"
+    assert len(q) == 0 and rows(db) == {}, "a job that keeps failing must eventually be dropped"
+
+
+CASES: list[tuple[str, Callable[[], None]]] = [
+    ("cancel during in-flight batch", case_cancel_in_flight),
+    ("reschedule during in-flight batch", case_reschedule_in_flight),
+    ("full queue", case_full_queue),
+    ("load() truncates to max_pending", case_load_truncates),
+    ("failing batch gives up", case_failing_batch_gives_up),
+]
+
+
+def main():
+    failed = 0
+    for name, fn in CASES:
+        try:
+            fn()
+        except Exception as e:
+            failed += 1
+            print(f"  ❌ {name}: {type(e).__name__}: {e}")
+        else:
+            print(f"  ✅ {name}")
+    print(f"\n{len(CASES) - failed}/{len(CASES)} passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
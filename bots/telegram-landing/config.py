@@ -0,0 +1,281 @@
+"""
+Configuration for the Telegram landing bot.
+
+`.env` (next to this file) is read and decoded once, then cached; `get_config()` builds a
+frozen `BotConfig` from the environment on first call. Nothing happens at import time.
+"""
+
+import codecs
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+ENV_PATH = SCRIPT_DIR / ".env"
+ENV_TXT_PATH = SCRIPT_DIR / ".env.txt"
+
+# Tried in order once UTF-16 is ruled out; cp1252 is the last resort.
+ENV_ENCODINGS = ("utf-8-sig", "cp1252")
+
+
+# Opening quote -> closing quote (including “smart quotes” from some editors)
+_QUOTES = {'"': '"', "'": "'", "“": "”"}
+# Inline comment, like python-dotenv: a `#` preceded by whitespace in an unquoted value.
+_INLINE_COMMENT = re.compile(r"\s+#.*$")
+
+
+# ---------- .env parsing ----------
+def _decode_env_bytes(raw: bytes) -> Optional[str]:
+    # Notepad on Windows often saves UTF-16 with a BOM: decode that properly first.
+    if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        try:
+            return raw.decode("utf-16")
+        except UnicodeDecodeError:
+            pass
+    # BOM-less (or broken) UTF-16: tokens/usernames are ASCII, so dropping NUL bytes
+    # leaves a parseable file.
+    if b"\x00" in raw:
+        raw = raw.replace(b"\x00", b"")
+    for enc in ENV_ENCODINGS:
+        try:
+            return raw.decode(enc)
+        except Exception:
+            continue
+    return None
+
+
+def _parse_env_line(line: str) -> Optional[tuple[str, str]]:
+    s = line.strip()
+    if not s or s.startswith("#"):
+        return None
+    if s.lower().startswith("export "):
+        s = s[7:].strip()
+
+    # Accept common separators:
+    # - KEY=VALUE   (recommended)
+    # - KEY: VALUE  (common in copied docs)
+    # - KEY VALUE   (common typo)
+    if "=" in s:
+        k, v = s.split("=", 1)
+    elif ":" in s:
+        k, v = s.split(":", 1)
+    else:
+        parts = s.split(None, 1)
+        if len(parts) != 2:
+            return None
+        k, v = parts
+
+    key = k.strip().lstrip("\ufeff")
+    if not key:
+        return None
+    v = v.strip()
+    close = _QUOTES.get(v[:1])
+    if close is not None:
+        end = v.find(close, 1)
+        if end != -1:
+            # Quoted value: keep it verbatim, ignore anything after the closing quote.
+            return key, v[1:end]
+    else:
+        v = _INLINE_COMMENT.sub("", v)
+    # Unbalanced quotes are stripped, as before
+    val = v.strip("'").strip('"').strip("“").strip("”")
+    return key, val
+
+
+@dataclass(frozen=True)
+class EnvFile:
+    path: Path
+    exists: bool
+    size: int
+    values: dict[str, str]
+
+    def info(self) -> str:
+        if not self.exists:
+            return f"{self.path.name}: missing"
+        return f"{self.path.name}: exists (size={self.size} bytes)"
+
+    def has_key(self, key: str) -> bool:
+        needle = key.strip().upper()
+        return any(k.upper() == needle for k in self.values)
+
+    def get(self, key: str) -> str:
+        needle = key.strip().upper()
+        for k, v in self.values.items():
+            if k.upper() == needle:
+                return v
+        return ""
+
+
+@lru_cache(maxsize=None)
+def read_env_file(path: Path) -> EnvFile:
+    """Read, decode and parse a `.env`-like file once (best-effort, never raises)."""
+    try:
+        raw = path.read_bytes()
+    except FileNotFoundError:
+        return EnvFile(path=path, exists=False, size=-1, values={})
+    except Exception:
+        return EnvFile(path=path, exists=True, size=-1, values={})
+
+    values: dict[str, str] = {}
+    text = _decode_env_bytes(raw)
+    if text is not None:
+        for line in text.splitlines():
+            parsed = _parse_env_line(line)
+            if parsed is not None:
+                values.setdefault(parsed[0], parsed[1])
+    return EnvFile(path=path, exists=True, size=len(raw), values=values)
+
+
+def load_local_env(env_path: Path = ENV_PATH) -> None:
+    """
+    Apply `.env` next to this script to `os.environ`.
+    Existing values win, except empty ones (common on Windows/PowerShell).
+    """
+    for key, val in read_env_file(env_path).values.items():
+        if os.environ.get(key, "").strip() == "":
+            os.environ[key] = val
+
+
+# ---------- Config ----------
+def _env(key: str) -> str:
+    return os.environ.get(key, "").strip()
+
+
+def _parse_int(s: str) -> Optional[int]:
+    try:
+        return int(s)
+    except Exception:
+        return None
+
+
+def _parse_float(s: str, default: float) -> float:
+    try:
+        v = float(s)
+    except Exception:
+        return default
+    return v if v > 0 else default
+
+
+def _parse_bool(s: str, default: bool = False) -> bool:
+    if not s:
+        return default
+    return s.lower() in ("1", "true", "yes", "on")
+
+
+def _parse_list(s: str) -> tuple[str, ...]:
+    return tuple(x.strip() for x in s.split(",") if x.strip())
+
+
+def _parse_pairs(s: str) -> tuple[tuple[str, str], ...]:
+    pairs: list[tuple[str, str]] = []
+    for item in _parse_list(s):
+        k, sep, v = item.partition("=")
+        if sep and k.strip() and v.strip():
+            pairs.append((k.strip(), v.strip()))
+    return tuple(pairs)
+
+
+def _parse_delays(s: str, default: tuple[float, ...]) -> tuple[float, ...]:
+    if not s:
+        return default
+    if s.lower() in ("off", "0", "none", "false"):
+        return ()
+    delays = tuple(d for d in (_parse_float(x, 0) for x in _parse_list(s)) if d > 0)
+    return delays or default
+
+
+@dataclass(frozen=True)
+class BotConfig:
+    bot_token: str
+    channel_username: str  # e.g. "SwapPilot_Official" (without @)
+    group_username: str  # optional (without @)
+    group_invite_link: str  # optional if group is private
+    db_path: str
+
+    # Optional (recommended when group is private / username changes)
+    channel_chat_id: Optional[int]  # e.g. -1001234567890
+    group_chat_id: Optional[int]  # e.g. -1001234567890
+
+    # Optional Prometheus endpoint (disabled when None)
+    metrics_port: Optional[int]
+    metrics_addr: str
+
+    # Flood protection (taps per user, and get_chat_member calls for the whole bot)
+    rate_limit_user_per_sec: float
+    rate_limit_user_burst: float
+    rate_limit_api_per_sec: float
+    rate_limit_api_burst: float
+
+    # Landing message A/B versions and per-campaign (start_param) overrides, see ui.py
+    landing_ab_versions: tuple[str, ...]
+    landing_campaign_versions: tuple[tuple[str, str], ...]
+
+    # Automatic rechecks after a failed verify (seconds between attempts; empty = disabled)
+    recheck_delays: tuple[float, ...]
+    recheck_max_pending: int
+    # The group is optional: rechecks wait for the channel only unless this is set
+    recheck_require_group: bool
+
+
+def _missing_token_message() -> str:
+    env_file = read_env_file(ENV_PATH)
+    env_txt_file = read_env_file(ENV_TXT_PATH)
+    env_file_token = env_file.get("BOT_TOKEN")
+    env_var = os.environ.get("BOT_TOKEN", "") or ""
+    return (
+        "Missing BOT_TOKEN env var.\n\n"
+        "Quick fixes:\n"
+        "- Put it in .env next to swappilot_bot.py as: BOT_TOKEN=123:ABC\n"
+        "- Or in PowerShell: $env:BOT_TOKEN=\"123:ABC\" then run again\n\n"
+        "Diagnostics:\n"
+        f"- cwd: {os.getcwd()}\n"
+        f"- script_dir: {SCRIPT_DIR}\n"
+        f"- env BOT_TOKEN present: {'BOT_TOKEN' in os.environ} (len={len(env_var)}, contains_colon={':' in env_var})\n"
+        f"- .env BOT_TOKEN extracted: (len={len(env_file_token)}, contains_colon={':' in env_file_token})\n"
+        f"- {env_file.info()} (BOT_TOKEN key detected: {env_file.has_key('BOT_TOKEN')})\n"
+        f"- {env_txt_file.info()} (BOT_TOKEN key detected: {env_txt_file.has_key('BOT_TOKEN')})\n"
+    )
+
+
+@lru_cache(maxsize=None)
+def get_config() -> BotConfig:
+    """Load `.env`, read the environment and validate it. Cached after the first call."""
+    load_local_env()
+
+    bot_token = _env("BOT_TOKEN")
+    if not bot_token:
+        raise RuntimeError(_missing_token_message())
+
+    channel_username = _env("CHANNEL_USERNAME")
+    channel_chat_id = _env("CHANNEL_CHAT_ID")
+    if not channel_username and not channel_chat_id:
+        raise RuntimeError(
+            "Missing CHANNEL_USERNAME or CHANNEL_CHAT_ID env var. "
+            "Example: set CHANNEL_USERNAME=SwapPilot_Official"
+        )
+    group_chat_id = _env("GROUP_CHAT_ID")
+    metrics_port = _env("METRICS_PORT")
+
+    return BotConfig(
+        bot_token=bot_token,
+        channel_username=channel_username,
+        group_username=_env("GROUP_USERNAME"),
+        group_invite_link=_env("GROUP_INVITE_LINK"),
+        db_path=_env("DB_PATH") or "swappilot.db",
+        channel_chat_id=_parse_int(channel_chat_id) if channel_chat_id else None,
+        group_chat_id=_parse_int(group_chat_id) if group_chat_id else None,
+        metrics_port=_parse_int(metrics_port) if metrics_port else None,
+        metrics_addr=_env("METRICS_ADDR") or "127.0.0.1",
+        rate_limit_user_per_sec=_parse_float(_env("RATE_LIMIT_USER_PER_SEC"), 0.5),
+        rate_limit_user_burst=_parse_float(_env("RATE_LIMIT_USER_BURST"), 5),
+        rate_limit_api_per_sec=_parse_float(_env("RATE_LIMIT_API_PER_SEC"), 20),
+        rate_limit_api_burst=_parse_float(_env("RATE_LIMIT_API_BURST"), 30),
+        landing_ab_versions=_parse_list(_env("LANDING_AB_VERSIONS")) or ("v1",),
+        landing_campaign_versions=_parse_pairs(_env("LANDING_CAMPAIGN_VERSIONS")),
+        recheck_delays=_parse_delays(_env("RECHECK_DELAYS"), (5.0, 10.0, 20.0, 40.0, 80.0)),
+        recheck_max_pending=int(_parse_float(_env("RECHECK_MAX_PENDING"), 10_000)),
+        recheck_require_group=_parse_bool(_env("RECHECK_REQUIRE_GROUP")),
+    )
@@ -0,0 +1,461 @@
+"""
+SwapPilot Telegram Landing Bot — Offline analytics export
+Copies `events`, `starts` and `user_state` out of the live SQLite DB into columnar files,
+so cohort/funnel analysis stops competing with the bot's writers for the WAL.
+
+- Reads through a read-only connection, in `fetchmany` chunks (constant memory).
+- `events.meta` JSON is flattened into typed columns (`meta_start_param`, `meta_channel`, ...).
+- Parquet (default) or Arrow IPC files, Hive-partitioned by UTC day: `events/date=2026-01-31/part-<ts>.parquet`.
+- Incremental: each run exports `watermark <= ts < now - lag` and saves the new watermark.
+- `report` runs the `analytics.sql` queries over the files with pyarrow.
+
+Usage:
+  python export_analytics.py export --db swappilot.db --out analytics_export
+  python export_analytics.py export --db swappilot.db --out analytics_export --format arrow --full
+  python export_analytics.py report --out analytics_export
+  python export_analytics.py report --out analytics_export --compare-sqlite swappilot.db
+
+Requirements:
+  pip install pyarrow
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# ─── Config ───────────────────────────────────────────────────────────
+CHUNK_SIZE = 50_000
+LAG_SECONDS = 5  # rows stamped in the last few seconds may still be waiting on db_lock
+STATE_FILE = "_export_state.json"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Known `events.meta` keys (see log_event calls in swappilot_bot.py); anything else -> meta_extra (JSON)
+META_STRING_KEYS = ("start_param", "message_version", "chat", "error")
+META_BOOL_KEYS = ("channel", "group")
+
+
+def _schemas() -> dict[str, "pa.Schema"]:
+    meta_fields = [pa.field(f"meta_{k}", pa.string()) for k in META_STRING_KEYS]
+    meta_fields += [pa.field(f"meta_{k}", pa.bool_()) for k in META_BOOL_KEYS]
+    return {
+        "events": pa.schema(
+            [
+                pa.field("user_id", pa.int64()),
+                pa.field("event", pa.string()),
+                pa.field("ts", pa.int64()),
+                *meta_fields,
+                pa.field("meta_extra", pa.string()),
+            ]
+        ),
+        "starts": pa.schema(
+            [pa.field("user_id", pa.int64()), pa.field("start_param", pa.string()), pa.field("ts", pa.int64())]
+        ),
+        "user_state": pa.schema(
+            [
+                pa.field("user_id", pa.int64()),
+                pa.field("last_start_param", pa.string()),
+                pa.field("last_seen_ts", pa.int64()),
+            ]
+        ),
+    }
+
+
+# ─── SQLite (read-only) ───────────────────────────────────────────────
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    path = Path(db_path).resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"SQLite DB not found: {path}")
+    return sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+
+
+def iter_chunks(conn: sqlite3.Connection, sql: str, params: tuple, chunk_size: int) -> Iterator[list[tuple]]:
+    cur = conn.execute(sql, params)
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+# ─── Flattening ───────────────────────────────────────────────────────
+def _as_bool(v: Any) -> Optional[bool]:
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, (int, float)):
+        return bool(v)
+    if isinstance(v, str):
+        return v.strip().lower() in ("1", "true", "yes")
+    return None
+
+
+def flatten_events(rows: list[tuple]) -> dict[str, list]:
+    """(user_id, event, meta_json, ts) rows -> column lists with typed meta_* columns."""
+    cols: dict[str, list] = {"user_id": [], "event": [], "ts": []}
+    for k in (*META_STRING_KEYS, *META_BOOL_KEYS):
+        cols[f"meta_{k}"] = []
+    cols["meta_extra"] = []
+
+    known = set(META_STRING_KEYS) | set(META_BOOL_KEYS)
+    for user_id, event, meta, ts in rows:
+        try:
+            m = json.loads(meta) if meta else {}
+            if not isinstance(m, dict):
+                m = {"_raw": m}
+        except Exception:
+            m = {"_raw": meta}
+        cols["user_id"].append(user_id)
+        cols["event"].append(event)
+        cols["ts"].append(ts)
+        for k in META_STRING_KEYS:
+            v = m.get(k)
+            cols[f"meta_{k}"].append(None if v is None else str(v))
+        for k in META_BOOL_KEYS:
+            cols[f"meta_{k}"].append(_as_bool(m.get(k)))
+        extra = {k: v for k, v in m.items() if k not in known}
+        cols["meta_extra"].append(json.dumps(extra, ensure_ascii=False) if extra else None)
+    return cols
+
+
+# ─── Writers ──────────────────────────────────────────────────────────
+class PartitionedWriter:
+    """
+    One open file per `date=` partition for the current run. Files are written as `.tmp`
+    and renamed by `commit()`, so a crash never leaves half-written parts behind.
+    """
+
+    def __init__(self, root: Path, schema: "pa.Schema", fmt: str, run_id: int):
+        self.root = root
+        self.schema = schema
+        self.fmt = fmt
+        self.run_id = run_id
+        self._writers: dict[str, Any] = {}
+        self._paths: dict[str, Path] = {}
+        self.rows = 0
+
+    def _writer(self, day: str):
+        w = self._writers.get(day)
+        if w is None:
+            part_dir = self.root / f"date={day}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            path = part_dir / f"part-{self.run_id}{FORMATS[self.fmt]}.tmp"
+            if self.fmt == "parquet":
+                w = pq.ParquetWriter(path, self.schema, compression="zstd")
+            else:
+                w = ipc.new_file(str(path), self.schema)
+            self._writers[day] = w
+            self._paths[day] = path
+        return w
+
+    def write(self, table: "pa.Table") -> None:
+        days = pc.strftime(pc.cast(table["ts"], pa.timestamp("s", tz="UTC")), format="%Y-%m-%d")
+        for day in pc.unique(days).to_pylist():
+            part = table.filter(pc.equal(days, day))
+            self._writer(day).write_table(part)
+            self.rows += part.num_rows
+
+    def commit(self) -> list[Path]:
+        done = []
+        for day, w in self._writers.items():
+            w.close()
+            tmp = self._paths[day]
+            final = tmp.with_suffix("")  # drop .tmp
+            os.replace(tmp, final)
+            done.append(final)
+        self._writers.clear()
+        return done
+
+    def abort(self) -> None:
+        for day, w in self._writers.items():
+            try:
+                w.close()
+            finally:
+                self._paths[day].unlink(missing_ok=True)
+        self._writers.clear()
+
+
+def write_snapshot(path: Path, table: "pa.Table", fmt: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        pq.write_table(table, tmp, compression="zstd")
+    else:
+        with ipc.new_file(str(tmp), table.schema) as w:
+            w.write_table(table)
+    os.replace(tmp, path)
+
+
+# ─── Export ───────────────────────────────────────────────────────────
+def load_state(out: Path) -> dict:
+    try:
+        return json.loads((out / STATE_FILE).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(out: Path, state: dict) -> None:
+    tmp = out / (STATE_FILE + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, out / STATE_FILE)
+
+
+def export(db_path: str, out: Path, fmt: str, chunk_size: int, lag_seconds: int, full: bool) -> None:
+    schemas = _schemas()
+    out.mkdir(parents=True, exist_ok=True)
+    state = {} if full else load_state(out)
+    if state.get("format", fmt) != fmt:
+        raise RuntimeError(f"{out} was exported as {state['format']}; use --full to switch to {fmt}")
+    state["format"] = fmt
+    if full:
+        for table in ("events", "starts", "user_state"):
+            shutil.rmtree(out / table, ignore_errors=True)
+        save_state(out, state)  # the old watermarks no longer match what is on disk
+
+    run_id = int(time.time())
+    high = run_id - lag_seconds
+    conn = connect_readonly(db_path)
+    try:
+        for table, select in (
+            ("events", "SELECT user_id, event, meta, ts FROM events WHERE ts >= ? AND ts < ?"),
+            ("starts", "SELECT user_id, start_param, ts FROM starts WHERE ts >= ? AND ts < ?"),
+        ):
+            low = int(state.get(table, {}).get("watermark_ts", 0))
+            writer = PartitionedWriter(out / table, schemas[table], fmt, run_id)
+            t0 = time.perf_counter()
+            try:
+                for rows in iter_chunks(conn, select, (low, high), chunk_size):
+                    if table == "events":
+                        cols = flatten_events(rows)
+                    else:
+                        cols = {name: list(col) for name, col in zip(schemas[table].names, zip(*rows))}
+                    writer.write(pa.Table.from_pydict(cols, schema=schemas[table]))
+                files = writer.commit()
+            except BaseException:
+                writer.abort()
+                raise
+            state[table] = {"watermark_ts": high, "rows_last_run": writer.rows}
+            # Committed files and their watermark move together: a later failure must not re-export them.
+            save_state(out, state)
+            print(
+                f"{table}: {writer.rows} rows in [{low}, {high}) -> {len(files)} file(s) "
+                f"in {time.perf_counter() - t0:.2f}s"
+            )
+
+        # user_state is mutable (upserts): export a full snapshot each run.
+        t0 = time.perf_counter()
+        batches = [
+            pa.RecordBatch.from_pydict(
+                {name: list(col) for name, col in zip(schemas["user_state"].names, zip(*rows))},
+                schema=schemas["user_state"],
+            )
+            for rows in iter_chunks(
+                conn, "SELECT user_id, last_start_param, last_seen_ts FROM user_state", (), chunk_size
+            )
+        ]
+        snapshot = pa.Table.from_batches(batches, schema=schemas["user_state"])
+        write_snapshot(out / "user_state" / f"snapshot{FORMATS[fmt]}", snapshot, fmt)
+        state["user_state"] = {"snapshot_ts": run_id, "rows": snapshot.num_rows}
+        save_state(out, state)
+        print(f"user_state: {snapshot.num_rows} rows snapshot in {time.perf_counter() - t0:.2f}s")
+    finally:
+        conn.close()
+
+
+# ─── Report (analytics.sql over the files) ────────────────────────────
+def open_dataset(out: Path, table: str) -> "ds.Dataset":
+    fmt = load_state(out).get("format", "parquet")
+    return ds.dataset(
+        out / table,
+        format="parquet" if fmt == "parquet" else "ipc",
+        partitioning="hive",
+        exclude_invalid_files=True,
+    )
+
+
+def event_counts(events: "ds.Dataset") -> list[tuple[str, int]]:
+    t = events.to_table(columns=["event"]).group_by("event").aggregate([("event", "count")])
+    return sorted(zip(t["event"].to_pylist(), t["event_count"].to_pylist()), key=lambda r: -r[1])
+
+
+FUNNEL_EVENTS = ("start", "landing_shown", "tap_channel", "tap_group", "verify_click")
+
+
+def campaign_funnel(events: "ds.Dataset") -> list[dict]:
+    """Same columns as the 'Funnel par campagne' query in analytics.sql."""
+    t = events.to_table(
+        columns=["meta_start_param", "event", "meta_channel", "meta_group"],
+        filter=(ds.field("meta_start_param") != ""),
+    )
+    counts = t.group_by(["meta_start_param", "event"]).aggregate([("event", "count")])
+    vr = t.filter(pc.equal(t["event"], "verify_result"))
+    ch = vr.filter(pc.fill_null(vr["meta_channel"], False)).group_by("meta_start_param").aggregate(
+        [("meta_start_param", "count")]
+    )
+    gr = vr.filter(pc.fill_null(vr["meta_group"], False)).group_by("meta_start_param").aggregate(
+        [("meta_start_param", "count")]
+    )
+
+    rows: dict[str, dict] = {}
+
+    def row(campaign: str) -> dict:
+        r = rows.get(campaign)
+        if r is None:
+            r = rows[campaign] = {"campaign": campaign, **{e: 0 for e in FUNNEL_EVENTS}}
+            r["channel_joins_verified"] = r["group_joins_verified"] = 0
+        return r
+
+    for c, e, n in zip(*(counts[k].to_pylist() for k in ("meta_start_param", "event", "event_count"))):
+        r = row(c)
+        if e in FUNNEL_EVENTS:
+            r[e] = n
+    for c, n in zip(ch["meta_start_param"].to_pylist(), ch["meta_start_param_count"].to_pylist()):
+        row(c)["channel_joins_verified"] = n
+    for c, n in zip(gr["meta_start_param"].to_pylist(), gr["meta_start_param_count"].to_pylist()):
+        row(c)["group_joins_verified"] = n
+    for r in rows.values():
+        r["conversion_rate_pct"] = round(100.0 * r["channel_joins_verified"] / r["start"], 2) if r["start"] else None
+    return sorted(rows.values(), key=lambda r: -r["start"])
+
+
+def failed_checks(events: "ds.Dataset") -> list[tuple[str, int]]:
+    t = events.to_table(columns=["meta_chat"], filter=(ds.field("event") == "check_membership_failed"))
+    g = t.group_by("meta_chat").aggregate([("meta_chat", "count")])
+    return list(zip(g["meta_chat"].to_pylist(), g["meta_chat_count"].to_pylist()))
+
+
+def hourly_activity(events: "ds.Dataset", now: Optional[int] = None) -> list[tuple[str, int]]:
+    since = (now or int(time.time())) - 86400
+    t = events.to_table(columns=["ts"], filter=(ds.field("ts") > since))
+    hours = pc.multiply(pc.divide(t["ts"], 3600), 3600)
+    g = pa.table({"hour": hours}).group_by("hour").aggregate([("hour", "count")])
+    out = [
+        (time.strftime("%Y-%m-%d %H:00", time.localtime(h)), n)
+        for h, n in zip(g["hour"].to_pylist(), g["hour_count"].to_pylist())
+    ]
+    return sorted(out, reverse=True)
+
+
+def top_campaigns(events: "ds.Dataset", limit: int = 5) -> list[tuple[Optional[str], int]]:
+    t = events.to_table(
+        columns=["meta_start_param"],
+        filter=(ds.field("event") == "verify_result") & (ds.field("meta_channel") == True),  # noqa: E712
+    )
+    g = t.group_by("meta_start_param").aggregate([("meta_start_param", "count")])
+    rows = zip(g["meta_start_param"].to_pylist(), g["meta_start_param_count"].to_pylist())
+    return sorted(rows, key=lambda r: -r[1])[:limit]
+
+
+def sqlite_funnel(db_path: str) -> list[tuple]:
+    """The 'Funnel par campagne' query from analytics.sql, for --compare-sqlite."""
+    sql = (Path(__file__).with_name("analytics.sql")).read_text(encoding="utf-8")
+    start = sql.index("SELECT", sql.index("Funnel par campagne"))
+    query = sql[start : sql.index(";", start)]
+    conn = connect_readonly(db_path)
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+
+def report(out: Path, compare_sqlite: Optional[str]) -> None:
+    events = open_dataset(out, "events")
+
+    print("== Events ==")
+    for e, n in event_counts(events):
+        print(f"  {e:<28} {n}")
+
+    print("\n== Funnel par campagne ==")
+    t0 = time.perf_counter()
+    funnel = campaign_funnel(events)
+    t_arrow = time.perf_counter() - t0
+    print(f"  {'campaign':<20} {'starts':>7} {'land':>7} {'tap_ch':>7} {'tap_gr':>7} {'verify':>7} "
+          f"{'ch_ok':>7} {'gr_ok':>7} {'conv%':>7}")
+    for r in funnel:
+        conv = "" if r["conversion_rate_pct"] is None else f"{r['conversion_rate_pct']:.2f}"
+        print(
+            f"  {r['campaign'][:20]:<20} {r['start']:>7} {r['landing_shown']:>7} {r['tap_channel']:>7} "
+            f"{r['tap_group']:>7} {r['verify_click']:>7} {r['channel_joins_verified']:>7} "
+            f"{r['group_joins_verified']:>7} {conv:>7}"
+        )
+
+    print("\n== Vérifications échouées ==")
+    for chat, n in failed_checks(events):
+        print(f"  {chat}: {n}")
+
+    print("\n== Activité par heure (24h) ==")
+    for hour, n in hourly_activity(events):
+        print(f"  {hour}  {n}")
+
+    print("\n== Top 5 campagnes ==")
+    for c, n in top_campaigns(events):
+        print(f"  {c!s:<28} {n}")
+
+    if compare_sqlite:
+        t0 = time.perf_counter()
+        rows = sqlite_funnel(compare_sqlite)
+        t_sql = time.perf_counter() - t0
+        print(
+            f"\nFunnel: arrow {t_arrow * 1000:.1f} ms vs SQLite json_extract {t_sql * 1000:.1f} ms "
+            f"({t_sql / t_arrow if t_arrow else 0:.1f}x), {len(funnel)} vs {len(rows)} campaigns"
+        )
+
+
+# ─── CLI ──────────────────────────────────────────────────────────────
+def default_db_path() -> str:
+    """DB_PATH as the bot sees it: environment first, then the bot's `.env` (no BOT_TOKEN needed)."""
+    from config import ENV_PATH, read_env_file
+
+    return os.environ.get("DB_PATH", "").strip() or read_env_file(ENV_PATH).get("DB_PATH") or "swappilot.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SwapPilot landing bot — columnar analytics export")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_exp = sub.add_parser("export", help="Export events/starts/user_state to Parquet or Arrow IPC")
+    p_exp.add_argument("--db", default=default_db_path(), help="SQLite path (default: DB_PATH, also read from .env)")
+    p_exp.add_argument("--out", default="analytics_export", help="Output directory")
+    p_exp.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    p_exp.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per fetch/write")
+    p_exp.add_argument("--lag-seconds", type=int, default=LAG_SECONDS, help="Skip rows newer than now - lag")
+    p_exp.add_argument("--full", action="store_true", help="Ignore the watermark and rewrite everything")
+
+    p_rep = sub.add_parser("report", help="Run the analytics.sql queries over the exported files")
+    p_rep.add_argument("--out", default="analytics_export", help="Export directory")
+    p_rep.add_argument("--compare-sqlite", metavar="DB", help="Also time the funnel query on this SQLite DB")
+
+    args = parser.parse_args()
+
+    if not HAS_PYARROW:
+        print("❌ pyarrow is required. Install with: pip install pyarrow")
+        sys.exit(1)
+
+    if args.cmd == "export":
+        if args.chunk_size <= 0:
+            parser.error("--chunk-size must be > 0")
+        export(args.db, Path(args.out), args.format, args.chunk_size, args.lag_seconds, args.full)
+    else:
+        report(Path(args.out), args.compare_sqlite)
+
+
+if __name__ == "__main__":
+    main()
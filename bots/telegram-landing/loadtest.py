@@ -0,0 +1,442 @@
+"""
+SwapPilot Telegram Landing Bot — Load Test Harness
+Drives the real `start` / `on_button` handlers with synthetic updates against a fake Bot
+(configurable `get_chat_member` latency) and a throwaway SQLite database.
+
+Reports, per concurrency level: throughput, p50/p95/p99 handler latency, and how long
+handlers waited on / held `db_lock`.
+
+Usage:
+  python loadtest.py
+  python loadtest.py --requests 2000 --concurrency 1,8,32,128 --member-latency-ms 80 --member-jitter-ms 40
+  python loadtest.py --mix start=1,go_channel=1,go_group=1,verify=3 --member-fail-rate 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+
+# ─── Config ───────────────────────────────────────────────────────────
+DEFAULT_CAMPAIGNS = ("", "ads_tg_01", "ads_tg_02", "x_thread", "partner_bsc")
+DEFAULT_MIX = "start=2,go_channel=1,go_group=1,verify=3"
+CALLBACK_KINDS = ("go_channel", "go_group", "verify")
+
+
+# ─── Fake Telegram Bot ────────────────────────────────────────────────
+class FakeBot:
+    """
+    Stand-in for `telegram.Bot` exposing only the methods the handlers reach.
+    Outgoing calls (reply/edit/answer) are instant; `get_chat_member` sleeps for a
+    configurable latency and can fail at a given rate, like a slow Bot API.
+    """
+
+    def __init__(self, latency_ms: float, jitter_ms: float, member_rate: float, fail_rate: float, seed: int):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.member_rate = member_rate
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.calls: dict[str, int] = {}
+        # Throttled taps are the only callbacks answered with a text (see `throttled_text`).
+        self.throttled_ids: set[str] = set()
+
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    async def get_chat_member(self, chat_id, user_id, **kwargs):
+        self._count("get_chat_member")
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+        await asyncio.sleep(delay)
+        if self.rng.random() < self.fail_rate:
+            raise RuntimeError("Bad Request: member list is inaccessible (simulated)")
+        status = "member" if self.rng.random() < self.member_rate else "left"
+        return SimpleNamespace(status=status, user=SimpleNamespace(id=user_id))
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self._count("send_message")
+        return True
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self._count("edit_message_text")
+        return True
+
+    async def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self._count("answer_callback_query")
+        if text:
+            self.throttled_ids.add(callback_query_id)
+        return True
+
+
+# ─── Instrumented lock ────────────────────────────────────────────────
+class TimedLock:
+    """Drop-in replacement for `threading.Lock` that records wait and hold durations."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._acquired_at = 0.0
+        self.wait_s: list[float] = []
+        self.hold_s: list[float] = []
+
+    def __enter__(self) -> "TimedLock":
+        t0 = time.perf_counter()
+        self._lock.acquire()
+        self._acquired_at = time.perf_counter()
+        self.wait_s.append(self._acquired_at - t0)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.hold_s.append(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    def reset(self) -> None:
+        self.wait_s.clear()
+        self.hold_s.clear()
+
+
+# ─── Synthetic updates ────────────────────────────────────────────────
+def build_start_update(bot_module, fake_bot: FakeBot, update_id: int, user_id: int, start_param: str):
+    """Build a `/start <param>` Update plus the matching handler context."""
+    from telegram import Chat, Message, Update, User
+
+    user = User(id=user_id, first_name="Load", is_bot=False)
+    chat = Chat(id=user_id, type=Chat.PRIVATE)
+    text = f"/start {start_param}".strip()
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(timezone.utc),
+        chat=chat,
+        from_user=user,
+        text=text,
+    )
+    message.set_bot(fake_bot)
+    update = Update(update_id=update_id, message=message)
+    update.set_bot(fake_bot)
+    context = SimpleNamespace(bot=fake_bot, args=[start_param] if start_param else [])
+    return bot_module.start, update, context
+
+
+def build_callback_update(bot_module, fake_bot: FakeBot, update_id: int, user_id: int, data: str):
+    """Build a callback-query Update (`go_channel` / `go_group` / `verify`) plus its context."""
+    from telegram import CallbackQuery, Chat, Message, Update, User
+
+    user = User(id=user_id, first_name="Load", is_bot=False)
+    chat = Chat(id=user_id, type=Chat.PRIVATE)
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(timezone.utc),
+        chat=chat,
+        from_user=user,
+        text=bot_module.get_ui().ab_variants[0].text,
+    )
+    message.set_bot(fake_bot)
+    query = CallbackQuery(
+        id=str(update_id),
+        from_user=user,
+        chat_instance=f"loadtest-{user_id}",
+        message=message,
+        data=data,
+    )
+    query.set_bot(fake_bot)
+    update = Update(update_id=update_id, callback_query=query)
+    update.set_bot(fake_bot)
+    context = SimpleNamespace(bot=fake_bot, args=[])
+    return bot_module.on_button, update, context
+
+
+# ─── Stats ────────────────────────────────────────────────────────────
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile over an already sorted list (0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    total: int
+    ok: int  # served by the handler (not throttled)
+    fail: int
+    elapsed_s: float
+    throttled: int = 0
+    latencies_ms: list[float] = field(default_factory=list)
+    per_kind_ms: dict[str, list[float]] = field(default_factory=dict)
+    throttled_ms: list[float] = field(default_factory=list)
+    throttled_per_kind: dict[str, int] = field(default_factory=dict)
+    lock_wait_ms: list[float] = field(default_factory=list)
+    lock_hold_ms: list[float] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.ok / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+# ─── Runner ───────────────────────────────────────────────────────────
+def parse_mix(spec: str) -> list[tuple[str, int]]:
+    mix: list[tuple[str, int]] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind != "start" and kind not in CALLBACK_KINDS:
+            raise ValueError(f"Unknown update kind in --mix: {kind!r}")
+        w = int(weight) if weight.strip() else 1
+        if w > 0:
+            mix.append((kind, w))
+    if not mix:
+        raise ValueError("--mix must select at least one update kind")
+    return mix
+
+
+async def run_level(
+    bot_module,
+    fake_bot: FakeBot,
+    lock: TimedLock,
+    concurrency: int,
+    total: int,
+    mix: list[tuple[str, int]],
+    users: int,
+    campaigns: tuple[str, ...],
+    seed: int,
+) -> LevelResult:
+    rng = random.Random(seed)
+    kinds = [k for k, _ in mix]
+    weights = [w for _, w in mix]
+    plan = rng.choices(kinds, weights, k=total)
+
+    res = LevelResult(concurrency=concurrency, total=total, ok=0, fail=0, elapsed_s=0.0)
+    lock.reset()
+    next_i = 0
+    errors: dict[str, int] = {}
+
+    async def one(i: int) -> None:
+        kind = plan[i]
+        user_id = 10_000_000 + (i % users)
+        update_id = seed * 1_000_000 + i
+        if kind == "start":
+            handler, update, context = build_start_update(
+                bot_module, fake_bot, update_id, user_id, campaigns[i % len(campaigns)]
+            )
+        else:
+            handler, update, context = build_callback_update(bot_module, fake_bot, update_id, user_id, kind)
+
+        t0 = time.perf_counter()
+        try:
+            await handler(update, context)
+        except Exception as e:
+            res.fail += 1
+            name = type(e).__name__
+            errors[name] = errors.get(name, 0) + 1
+            return
+        dt_ms = (time.perf_counter() - t0) * 1000.0
+        if update.callback_query is not None and update.callback_query.id in fake_bot.throttled_ids:
+            # Answered from memory by the rate limiter: keep it out of served latency/throughput.
+            res.throttled += 1
+            res.throttled_ms.append(dt_ms)
+            res.throttled_per_kind[kind] = res.throttled_per_kind.get(kind, 0) + 1
+            return
+        res.ok += 1
+        res.latencies_ms.append(dt_ms)
+        res.per_kind_ms.setdefault(kind, []).append(dt_ms)
+
+    async def worker() -> None:
+        nonlocal next_i
+        while True:
+            i = next_i
+            next_i += 1
+            if i >= total:
+                return
+            await one(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    res.elapsed_s = time.perf_counter() - start
+
+    res.lock_wait_ms = [s * 1000.0 for s in lock.wait_s]
+    res.lock_hold_ms = [s * 1000.0 for s in lock.hold_s]
+    if errors:
+        print(f"  ⚠️  c={concurrency}: handler errors {errors}")
+    return res
+
+
+def print_report(results: list[LevelResult]) -> None:
+    print()
+    print("─" * 114)
+    print(
+        f"{'conc':>5} {'served':>7} {'thrott':>6} {'fail':>5} {'req/s':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+        f"{'lock waits':>10} {'wait tot ms':>11} {'wait p99':>9} {'hold tot ms':>11}"
+    )
+    print("─" * 114)
+    for r in results:
+        lat = sorted(r.latencies_ms)
+        waits = sorted(r.lock_wait_ms)
+        print(
+            f"{r.concurrency:>5} {r.ok:>7} {r.throttled:>6} {r.fail:>5} {r.throughput:>9.1f} "
+            f"{percentile(lat, 50):>8.2f} {percentile(lat, 95):>8.2f} {percentile(lat, 99):>8.2f} "
+            f"{(lat[-1] if lat else 0.0):>8.2f} "
+            f"{len(waits):>10} {sum(waits):>11.2f} {percentile(waits, 99):>9.3f} {sum(r.lock_hold_ms):>11.2f}"
+        )
+    print("─" * 114)
+    print("served = handled in full (req/s and latencies); thrott = answered by the rate limiter")
+
+    print("\nPer update kind, served (p50 / p95 / p99 ms):")
+    for r in results:
+        parts = []
+        for kind in ("start", *CALLBACK_KINDS):
+            lat = sorted(r.per_kind_ms.get(kind, []))
+            if lat:
+                parts.append(
+                    f"{kind}={percentile(lat, 50):.1f}/{percentile(lat, 95):.1f}/{percentile(lat, 99):.1f}"
+                )
+        print(f"  c={r.concurrency:<4} " + "  ".join(parts))
+
+    if any(r.throttled for r in results):
+        print("\nThrottled taps (count per kind, p50 / p99 ms) — use --no-rate-limit to benchmark handlers only:")
+        for r in results:
+            lat = sorted(r.throttled_ms)
+            counts = "  ".join(f"{k}={n}" for k, n in sorted(r.throttled_per_kind.items()))
+            print(f"  c={r.concurrency:<4} {counts}  latency={percentile(lat, 50):.2f}/{percentile(lat, 99):.2f}")
+
+
+def load_bot_module(db_path: str, with_group: bool, rate_limit: bool = True):
+    """
+    Import `swappilot_bot` with a harmless configuration so the module-level checks pass
+    and all writes land in a throwaway database.
+    """
+    os.environ["BOT_TOKEN"] = "0:loadtest"
+    os.environ["DB_PATH"] = db_path
+    os.environ.setdefault("CHANNEL_USERNAME", "SwapPilot_LoadTest")
+    if with_group:
+        os.environ.setdefault("GROUP_USERNAME", "SwapPilot_LoadTest_Group")
+    if not rate_limit:
+        for key in ("RATE_LIMIT_USER_PER_SEC", "RATE_LIMIT_USER_BURST", "RATE_LIMIT_API_PER_SEC", "RATE_LIMIT_API_BURST"):
+            os.environ[key] = "1e9"
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import swappilot_bot  # noqa: E402
+
+    return swappilot_bot
+
+
+def reset_bot_state(bot_module) -> None:
+    """
+    Fresh rate-limit buckets, verify cache and recheck queue, so each concurrency level
+    starts from the same state instead of inheriting the previous level's drained buckets.
+    """
+    bot_module.user_limiter.cache_clear()
+    bot_module.api_limiter.cache_clear()
+    bot_module.get_recheck_queue.cache_clear()
+    bot_module.last_verify = bot_module.TTLCache(max_size=100_000, ttl=600)
+    bot_module.db_exec("DELETE FROM recheck_jobs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SwapPilot Telegram landing bot load test")
+    parser.add_argument("--requests", "-n", type=int, default=1000, help="Updates per concurrency level")
+    parser.add_argument(
+        "--concurrency", "-c", default="1,4,16,64", help="Comma-separated concurrency levels (default: 1,4,16,64)"
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted update kinds (default: {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=500, help="Distinct synthetic user ids")
+    parser.add_argument(
+        "--campaigns", default=",".join(DEFAULT_CAMPAIGNS), help="Comma-separated start params ('' allowed)"
+    )
+    parser.add_argument("--member-latency-ms", type=float, default=50.0, help="Mean get_chat_member latency")
+    parser.add_argument("--member-jitter-ms", type=float, default=20.0, help="Uniform +/- jitter on that latency")
+    parser.add_argument("--member-rate", type=float, default=0.7, help="Share of users reported as members")
+    parser.add_argument("--member-fail-rate", type=float, default=0.0, help="Share of get_chat_member calls that raise")
+    parser.add_argument("--no-group", action="store_true", help="Run without a group configured")
+    parser.add_argument("--no-rate-limit", action="store_true", help="Disable the bot's flood protection")
+    parser.add_argument("--db", default="", help="SQLite path (default: temporary file, deleted afterwards)")
+    parser.add_argument("--seed", type=int, default=1, help="RNG seed")
+    parser.add_argument("--verbose", action="store_true", help="Keep the bot's warning logs (e.g. simulated failures)")
+    args = parser.parse_args()
+
+    if args.requests <= 0:
+        parser.error("--requests must be > 0")
+    if args.users <= 0:
+        parser.error("--users must be > 0")
+    try:
+        levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if not levels or any(c <= 0 for c in levels):
+        parser.error("--concurrency levels must be > 0")
+    campaigns = tuple(c.strip() for c in args.campaigns.split(",")) or ("",)
+
+    tmp_dir: Optional[tempfile.TemporaryDirectory] = None
+    db_path = args.db
+    if not db_path:
+        tmp_dir = tempfile.TemporaryDirectory(prefix="swappilot-loadtest-")
+        db_path = str(Path(tmp_dir.name) / "loadtest.db")
+
+    bot_module = load_bot_module(db_path, with_group=not args.no_group, rate_limit=not args.no_rate_limit)
+    if not args.verbose:
+        logging.getLogger(bot_module.__name__).setLevel(logging.ERROR)
+    bot_module.init_db()
+    lock = TimedLock()
+    bot_module.db_lock = lock
+
+    fake_bot = FakeBot(
+        latency_ms=args.member_latency_ms,
+        jitter_ms=args.member_jitter_ms,
+        member_rate=args.member_rate,
+        fail_rate=args.member_fail_rate,
+        seed=args.seed,
+    )
+
+    print(f"DB: {db_path}")
+    print(
+        f"Mix: {args.mix} | users={args.users} | get_chat_member={args.member_latency_ms:.0f}"
+        f"±{args.member_jitter_ms:.0f} ms (fail {args.member_fail_rate:.0%})"
+    )
+
+    results: list[LevelResult] = []
+    try:
+        for level_idx, c in enumerate(levels):
+            print(f"Running c={c} ({args.requests} updates)...")
+            reset_bot_state(bot_module)
+            results.append(
+                asyncio.run(
+                    run_level(
+                        bot_module,
+                        fake_bot,
+                        lock,
+                        concurrency=c,
+                        total=args.requests,
+                        mix=mix,
+                        users=args.users,
+                        campaigns=campaigns,
+                        seed=args.seed + level_idx,
+                    )
+                )
+            )
+    finally:
+        bot_module.close_db()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    print_report(results)
+    print(f"\nFake Bot API calls: {fake_bot.calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Prometheus metrics for the Telegram landing bot.
+
+Exposed on a local HTTP endpoint (`/metrics`) when `METRICS_PORT` is set:
+  METRICS_PORT=9091            # disabled when empty
+  METRICS_ADDR=127.0.0.1       # use 0.0.0.0 for Fly.io's [metrics] scraper
+
+Durations are in milliseconds, like the API's `swappilot_*_ms` metrics.
+If `prometheus-client` is not installed, every metric is a no-op so the bot still runs.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server
+
+    HAS_PROMETHEUS = True
+except ImportError:
+    HAS_PROMETHEUS = False
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- No-op fallback ----------
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def set_function(self, f: Callable[[], float]) -> None:
+        pass
+
+
+# ---------- Buckets ----------
+# Handlers are dominated by get_chat_member round trips; DB work is sub-millisecond.
+HANDLER_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+API_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+DB_BUCKETS_MS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250)
+LAG_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+
+if HAS_PROMETHEUS:
+    registry = CollectorRegistry()
+
+    handler_duration_ms = Histogram(
+        "swappilot_bot_handler_duration_ms",
+        "Update handler duration in milliseconds",
+        ["handler", "action"],
+        buckets=HANDLER_BUCKETS_MS,
+        registry=registry,
+    )
+    db_lock_wait_ms = Histogram(
+        "swappilot_bot_db_lock_wait_ms",
+        "Time spent waiting to acquire db_lock in milliseconds",
+        buckets=DB_BUCKETS_MS,
+        registry=registry,
+    )
+    db_lock_hold_ms = Histogram(
+        "swappilot_bot_db_lock_hold_ms",
+        "Time db_lock was held in milliseconds",
+        buckets=DB_BUCKETS_MS,
+        registry=registry,
+    )
+    db_commit_ms = Histogram(
+        "swappilot_bot_db_commit_ms",
+        "SQLite commit latency in milliseconds",
+        buckets=DB_BUCKETS_MS,
+        registry=registry,
+    )
+    chat_member_duration_ms = Histogram(
+        "swappilot_bot_get_chat_member_duration_ms",
+        "get_chat_member round trip in milliseconds",
+        ["chat", "status"],
+        buckets=API_BUCKETS_MS,
+        registry=registry,
+    )
+    chat_member_failures_total = Counter(
+        "swappilot_bot_get_chat_member_failures_total",
+        "get_chat_member calls that raised",
+        ["chat"],
+        registry=registry,
+    )
+    throttled_total = Counter(
+        "swappilot_bot_throttled_total",
+        "Button taps rejected by the rate limiter (user = per-user bucket, api = global Bot API bucket)",
+        ["scope"],
+        registry=registry,
+    )
+    update_lag_ms = Histogram(
+        "swappilot_bot_update_lag_ms",
+        "Time an update (any type) waited in the update queue between being fetched and dispatched, in milliseconds",
+        buckets=LAG_BUCKETS_MS,
+        registry=registry,
+    )
+    update_queue_depth = Gauge(
+        "swappilot_bot_update_queue_depth",
+        "Updates fetched from Telegram but not yet dispatched to a handler",
+        registry=registry,
+    )
+    recheck_jobs_total = Counter(
+        "swappilot_bot_recheck_jobs_total",
+        "Automatic membership rechecks by outcome "
+        "(confirmed, retry, gave_up, error = get_chat_member failed, dropped = queue full)",
+        ["outcome"],
+        registry=registry,
+    )
+    recheck_api_calls_total = Counter(
+        "swappilot_bot_recheck_api_calls_total",
+        "get_chat_member calls made by automatic rechecks",
+        registry=registry,
+    )
+    recheck_api_calls_saved_total = Counter(
+        "swappilot_bot_recheck_api_calls_saved_total",
+        "Lower bound on get_chat_member calls avoided: one manual verify per recheck-confirmed user",
+        registry=registry,
+    )
+    recheck_pending = Gauge(
+        "swappilot_bot_recheck_pending",
+        "Rechecks waiting in the queue",
+        registry=registry,
+    )
+else:
+    registry = None
+    handler_duration_ms = _NoopMetric()
+    db_lock_wait_ms = _NoopMetric()
+    db_lock_hold_ms = _NoopMetric()
+    db_commit_ms = _NoopMetric()
+    chat_member_duration_ms = _NoopMetric()
+    chat_member_failures_total = _NoopMetric()
+    throttled_total = _NoopMetric()
+    update_lag_ms = _NoopMetric()
+    update_queue_depth = _NoopMetric()
+    recheck_jobs_total = _NoopMetric()
+    recheck_api_calls_total = _NoopMetric()
+    recheck_api_calls_saved_total = _NoopMetric()
+    recheck_pending = _NoopMetric()
+
+
+# ---------- Helpers ----------
+@contextmanager
+def timed_ms(histogram) -> Iterator[None]:
+    """Observe the duration of the `with` block (milliseconds) on `histogram`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe((time.perf_counter() - t0) * 1000.0)
+
+
+class TimedUpdateQueue(asyncio.Queue):
+    """
+    FIFO update queue that observes `update_lag_ms` for every item it hands out,
+    from `put` (Updater fetched it) to `get` (Application dispatches it). Pass it to
+    `ApplicationBuilder().update_queue(...)`.
+    """
+
+    def _init(self, maxsize: int) -> None:
+        super()._init(maxsize)
+        self._enqueued_at: deque[float] = deque()
+
+    def _put(self, item) -> None:
+        self._enqueued_at.append(time.monotonic())
+        super()._put(item)
+
+    def _get(self):
+        update_lag_ms.observe((time.monotonic() - self._enqueued_at.popleft()) * 1000.0)
+        return super()._get()
+
+
+def start_server(port: Optional[int], addr: str = "127.0.0.1") -> bool:
+    """Start the `/metrics` HTTP endpoint in a daemon thread. Returns False if disabled/unavailable."""
+    if not port:
+        return False
+    if not HAS_PROMETHEUS:
+        logger.warning("METRICS_PORT is set but prometheus-client is not installed; metrics disabled.")
+        return False
+    start_http_server(port, addr=addr, registry=registry)
+    logger.info("Metrics endpoint listening on http://%s:%s/metrics", addr, port)
+    return True
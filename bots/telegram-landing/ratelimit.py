@@ -0,0 +1,123 @@
+"""
+In-memory rate limiting for the Telegram landing bot.
+
+- `TokenBucket`: classic token bucket (`rate` tokens/sec, up to `burst`).
+- `KeyedRateLimiter`: one bucket per key (user id), stored in a bounded `TTLCache`.
+  An idle bucket is dropped once it would have refilled completely, so expiring it
+  never changes a decision and memory stays proportional to *active* users.
+- `TTLCache`: small LRU + idle-expiry map, also used to remember the last verify result.
+
+Not thread-safe on purpose: handlers run on the single asyncio event loop.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """Bounded map: entries expire `ttl` seconds after their last write, oldest evicted past `max_size`."""
+
+    def __init__(self, max_size: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        if max_size <= 0:
+            raise ValueError("max_size must be > 0")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[K, tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= self._clock():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        now = self._clock()
+        self._data[key] = (now + self.ttl, value)
+        self._data.move_to_end(key)
+        self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # Entries are ordered by last write, so expired ones are always at the front.
+        data = self._data
+        while data:
+            key, (expires_at, _) = next(iter(data.items()))
+            if expires_at > now and len(data) <= self.max_size:
+                break
+            del data[key]
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst` tokens. Starts full."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "_clock")
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or burst <= 0:
+            raise ValueError("rate and burst must be > 0")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def allow(self, cost: float = 1.0) -> bool:
+        """Take `cost` tokens if available. Never blocks."""
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def delay(self, cost: float = 1.0) -> float:
+        """Seconds until `cost` tokens are available (0 if now). Does not take tokens."""
+        self._refill()
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+
+class KeyedRateLimiter(Generic[K]):
+    """A `TokenBucket` per key, bounded to `max_keys` and expired once idle buckets are full again."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._buckets: TTLCache[K, TokenBucket] = TTLCache(max_keys, ttl=burst / rate, clock=clock)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: K, cost: float = 1.0) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, clock=self._clock)
+        ok = bucket.allow(cost)
+        self._buckets.set(key, bucket)
+        return ok
+
+    def delay(self, key: K, cost: float = 1.0) -> float:
+        """Seconds until `key` may spend `cost` tokens (0 if now). Does not take tokens."""
+        bucket = self._buckets.get(key)
+        return 0.0 if bucket is None else bucket.delay(cost)
@@ -0,0 +1,244 @@
+"""
+Delayed membership rechecks for the Telegram landing bot.
+
+After a negative "Verify", instead of asking the user to tap again we queue a recheck.
+A manual tap replaces the user's pending job, so a job that ends up confirmed always
+means at least one manual verify (membership calls + DB writes) was avoided.
+
+- `RecheckQueue`: bounded priority queue (heap on due time), one pending job per user,
+  mirrored to the `recheck_jobs` SQLite table so pending jobs survive restarts.
+- `RecheckScheduler`: sleeps until the next job is due, then hands every job due in that
+  window to a batch callback (the bot runs their `get_chat_member` calls together and
+  writes the outcomes in one transaction).
+
+Backoff is a fixed list of delays (seconds), e.g. 5, 10, 20, 40, 80: attempt N waits delays[N].
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 10_000
+BATCH_SIZE = 50
+# Jobs due within this window of the first one are processed in the same batch.
+BATCH_WINDOW_S = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recheck_jobs (
+  user_id INTEGER PRIMARY KEY,
+  chat_id INTEGER,
+  message_id INTEGER,
+  start_param TEXT,
+  attempt INTEGER,
+  due_ts REAL,
+  created_ts INTEGER
+)
+"""
+
+
+@dataclass(frozen=True)
+class RecheckJob:
+    user_id: int
+    chat_id: int  # where the verify message lives (private chat with the user)
+    message_id: int  # verify message to edit once membership is confirmed
+    start_param: str
+    attempt: int  # 0 = first automatic recheck
+    due_ts: float  # wall clock (time.time()), so it survives restarts
+    created_ts: int
+
+    def as_row(self) -> tuple:
+        return (
+            self.user_id,
+            self.chat_id,
+            self.message_id,
+            self.start_param,
+            self.attempt,
+            self.due_ts,
+            self.created_ts,
+        )
+
+
+UPSERT_SQL = "INSERT OR REPLACE INTO recheck_jobs VALUES (?,?,?,?,?,?,?)"
+DELETE_SQL = "DELETE FROM recheck_jobs WHERE user_id=?"
+SELECT_SQL = "SELECT user_id, chat_id, message_id, start_param, attempt, due_ts, created_ts FROM recheck_jobs"
+
+
+class RecheckQueue:
+    """
+    Heap of (due_ts, seq, user_id) with lazy deletion; `_jobs` holds the live job per user.
+    Persistence goes through the bot's DB helpers so it shares `db_lock` and its metrics.
+    """
+
+    def __init__(
+        self,
+        db_executemany: Callable[[str, list[tuple]], None],
+        db_query_all: Callable[[str], list[tuple]],
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        self._db_executemany = db_executemany
+        self._db_query_all = db_query_all
+        self.max_pending = max_pending
+        self._heap: list[tuple[float, int, int]] = []
+        self._jobs: dict[int, tuple[int, RecheckJob]] = {}
+        self._seq = itertools.count()
+        # Popped by `pop_due` but not yet `finish`ed; `_cancelled` marks those whose user
+        # confirmed manually meanwhile, so the batch must not re-queue them.
+        self._in_flight: set[int] = set()
+        self._cancelled: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._jobs
+
+    def get(self, user_id: int) -> Optional[RecheckJob]:
+        entry = self._jobs.get(user_id)
+        return entry[1] if entry else None
+
+    def _push(self, job: RecheckJob) -> None:
+        seq = next(self._seq)
+        self._jobs[job.user_id] = (seq, job)
+        heapq.heappush(self._heap, (job.due_ts, seq, job.user_id))
+
+    def load(self) -> int:
+        """Restore pending jobs from SQLite (call once at startup). Returns how many were loaded."""
+        rows = self._db_query_all(SELECT_SQL)
+        rows.sort(key=lambda r: r[5])
+        for row in rows[: self.max_pending]:
+            self._push(RecheckJob(*row))
+        if len(rows) > self.max_pending:
+            self._db_executemany(DELETE_SQL, [(r[0],) for r in rows[self.max_pending :]])
+        return len(self._jobs)
+
+    def schedule(self, job: RecheckJob) -> bool:
+        """Add or replace the user's job. Returns False (job dropped) when the queue is full."""
+        if job.user_id not in self._jobs and len(self._jobs) >= self.max_pending:
+            return False
+        self._push(job)
+        self._db_executemany(UPSERT_SQL, [job.as_row()])
+        return True
+
+    def cancel(self, user_id: int) -> None:
+        """Drop the user's pending job, including one currently being processed."""
+        pending = self._jobs.pop(user_id, None) is not None
+        if user_id in self._in_flight:
+            self._cancelled.add(user_id)
+        elif not pending:
+            return
+        self._db_executemany(DELETE_SQL, [(user_id,)])
+
+    def superseded(self, user_id: int) -> bool:
+        """True if an in-flight job was cancelled or replaced by a newer one since `pop_due`."""
+        return user_id in self._cancelled or user_id in self._jobs
+
+    def next_due(self) -> Optional[float]:
+        heap = self._heap
+        while heap:
+            due, seq, user_id = heap[0]
+            entry = self._jobs.get(user_id)
+            if entry is not None and entry[0] == seq:
+                return due
+            heapq.heappop(heap)  # stale: replaced or cancelled
+        return None
+
+    def pop_due(self, now: float, limit: int) -> list[RecheckJob]:
+        """Remove and return up to `limit` jobs due at `now` (still persisted until `finish`)."""
+        out: list[RecheckJob] = []
+        heap = self._heap
+        while heap and len(out) < limit:
+            due, seq, user_id = heap[0]
+            entry = self._jobs.get(user_id)
+            if entry is None or entry[0] != seq:
+                heapq.heappop(heap)
+                continue
+            if due > now:
+                break
+            heapq.heappop(heap)
+            del self._jobs[user_id]
+            self._in_flight.add(user_id)
+            out.append(entry[1])
+        return out
+
+    def finish(self, done: Iterable[int], retry: Iterable[RecheckJob]) -> None:
+        """Persist a processed batch: drop finished jobs and re-queue retries, in one transaction each."""
+        done = list(done)
+        retry = list(retry)
+        done_rows = [(uid,) for uid in done if uid not in self._jobs]
+        retry_rows: list[tuple] = []
+        for job in retry:
+            # A manual verify meanwhile either confirmed (cancelled) or queued a newer job: keep that.
+            if not self.superseded(job.user_id):
+                self._push(job)
+                retry_rows.append(job.as_row())
+        for uid in itertools.chain(done, (job.user_id for job in retry)):
+            self._in_flight.discard(uid)
+            self._cancelled.discard(uid)
+        if done_rows:
+            self._db_executemany(DELETE_SQL, done_rows)
+        if retry_rows:
+            self._db_executemany(UPSERT_SQL, retry_rows)
+
+
+class RecheckScheduler:
+    """Runs due jobs in batches: `process(jobs)` is awaited once per batch."""
+
+    def __init__(
+        self,
+        queue: RecheckQueue,
+        process: Callable[[list[RecheckJob]], Awaitable[None]],
+        batch_size: int = BATCH_SIZE,
+        batch_window_s: float = BATCH_WINDOW_S,
+        max_attempts: int = 5,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.queue = queue
+        self.process = process
+        self.batch_size = batch_size
+        self.batch_window_s = batch_window_s
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._wakeup = asyncio.Event()
+        self._stopped = False
+
+    def wake(self) -> None:
+        """Call after scheduling a job so the loop re-evaluates its sleep."""
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wakeup.set()
+
+    async def _sleep_until(self, due: Optional[float]) -> None:
+        self._wakeup.clear()
+        timeout = None if due is None else max(0.0, due - self.clock())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self) -> None:
+        while not self._stopped:
+            due = self.queue.next_due()
+            if due is None or due > self.clock():
+                await self._sleep_until(due)
+                continue
+            # Everything due now or within the window rides along in this batch.
+            jobs = self.queue.pop_due(self.clock() + self.batch_window_s, self.batch_size)
+            try:
+                await self.process(jobs)
+            except Exception:
+                logger.exception("recheck batch of %d job(s) failed", len(jobs))
+                # Put them back for a later try, counting it as an attempt so they eventually give up.
+                retry = [
+                    replace(j, attempt=j.attempt + 1, due_ts=self.clock() + 30)
+                    for j in jobs
+                    if j.attempt + 1 < self.max_attempts
+                ]
+                self.queue.finish(done=[j.user_id for j in jobs if j.attempt + 1 >= self.max_attempts], retry=retry)
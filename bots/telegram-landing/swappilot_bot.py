@@ -1,284 +1,63 @@
+from __future__ import annotations
+
+import asyncio
 import json
 import logging
 import os
-from pathlib import Path
 import sqlite3
 import threading
 import time
-from dataclasses import dataclass
-from typing import Optional
-
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import (
-    ApplicationBuilder,
-    CallbackQueryHandler,
-    CommandHandler,
-    ContextTypes,
-)
-
-
-# ---------- Logging ----------
-logging.basicConfig(format="%(asctime)s | %(levelname)s | %(message)s", level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-
-def _load_env_file_manual(env_path: Path) -> None:
-    """
-    Minimal .env loader fallback (handles UTF-8/UTF-16 saved by Notepad).
-    - Does NOT override already-set environment variables.
-    - Ignores comments and blank lines.
-    """
-    if not env_path.exists():
-        return
-
-    raw = env_path.read_bytes()
-
-    # Notepad often saves as UTF-16; tokens/usernames are ASCII, so removing NUL bytes is safe
-    # and makes parsing resilient even if decoding guesses fail.
-    if b"\x00" in raw:
-        raw = raw.replace(b"\x00", b"")
-    text: Optional[str] = None
-    for enc in ("utf-8-sig", "utf-16", "utf-16-le", "utf-16-be", "cp1252"):
-        try:
-            text = raw.decode(enc)
-            break
-        except Exception:
-            continue
-
-    if text is None:
-        return
-
-    for line in text.splitlines():
-        s = line.strip()
-        if not s or s.startswith("#"):
-            continue
-        if s.lower().startswith("export "):
-            s = s[7:].strip()
-
-        # Accept common separators:
-        # - KEY=VALUE   (recommended)
-        # - KEY: VALUE  (common in copied docs)
-        # - KEY VALUE   (common typo)
-        key = ""
-        val = ""
-        if "=" in s:
-            k, v = s.split("=", 1)
-            key = k.strip().lstrip("\ufeff")
-            val = v.strip()
-        elif ":" in s:
-            k, v = s.split(":", 1)
-            key = k.strip().lstrip("\ufeff")
-            val = v.strip()
-        else:
-            parts = s.split(None, 1)
-            if len(parts) == 2:
-                key = parts[0].strip().lstrip("\ufeff")
-                val = parts[1].strip()
-            else:
-                continue
-
-        # Strip common quotes (including “smart quotes” from some editors)
-        val = val.strip().strip("'").strip('"').strip("“").strip("”")
-        if not key:
-            continue
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from functools import lru_cache, wraps
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterator, Optional
 
-        # Override only if not set OR set to empty (common on Windows/PowerShell).
-        if key not in os.environ or (os.environ.get(key, "").strip() == ""):
-            os.environ[key] = val
+import metrics
+from config import BotConfig, get_config
+from ratelimit import KeyedRateLimiter, TokenBucket, TTLCache
+from recheck import SCHEMA as RECHECK_SCHEMA
+from recheck import RecheckJob, RecheckQueue, RecheckScheduler
+from ui import BotUi, build_ui
 
+if TYPE_CHECKING:
+    # telegram / telegram.ext are the bulk of import time; load them only where needed.
+    from telegram import Bot, Update
+    from telegram.ext import Application, ContextTypes
 
-def load_local_env() -> None:
-    """Load `.env` next to this script (python-dotenv if possible, else manual)."""
-    env_path = Path(__file__).with_name(".env")
 
-    # Try python-dotenv first (nice parsing rules), then fallback.
-    try:
-        from dotenv import load_dotenv  # type: ignore
-
-        # Do not override real values, but if the var exists and is empty, we want .env to win.
-        # python-dotenv doesn't have "override only empty", so we do: first pass no-override,
-        # then fallback manual loader that overrides empties.
-        load_dotenv(dotenv_path=env_path, override=False)
-    except Exception:
-        _load_env_file_manual(env_path)
-    else:
-        # Still fallback if BOT_TOKEN wasn't picked up (common with UTF-16 .env or empty env var)
-        if not os.environ.get("BOT_TOKEN", "").strip():
-            _load_env_file_manual(env_path)
-
-
-load_local_env()
-
-
-def _env_file_info(path: Path) -> str:
-    if not path.exists():
-        return f"{path.name}: missing"
-    try:
-        size = path.stat().st_size
-    except Exception:
-        size = -1
-    return f"{path.name}: exists (size={size} bytes)"
-
-
-def _env_has_key(path: Path, key: str) -> bool:
-    if not path.exists():
-        return False
-    raw = path.read_bytes()
-    text: Optional[str] = None
-    for enc in ("utf-8-sig", "utf-16", "utf-16-le", "utf-16-be", "cp1252"):
-        try:
-            text = raw.decode(enc)
-            break
-        except Exception:
-            continue
-    if text is None:
-        return False
-
-    needle = key.strip().upper()
-    for line in text.splitlines():
-        s = line.strip()
-        if not s or s.startswith("#"):
-            continue
-        if s.lower().startswith("export "):
-            s = s[7:].strip()
-        # Accept spaces around '='
-        if "=" in s:
-            k = s.split("=", 1)[0].strip().lstrip("\ufeff").upper()
-            if k == needle:
-                return True
-        else:
-            # Common typo: "BOT_TOKEN: xxx" or "BOT_TOKEN xxx"
-            k = s.split(None, 1)[0].strip().lstrip("\ufeff").upper()
-            if k == needle:
-                return True
-    return False
-
-
-def _extract_env_value(path: Path, key: str) -> str:
-    """Extract KEY value from .env-like file (best-effort). Returns '' if missing/unparseable."""
-    if not path.exists():
-        return ""
-    raw = path.read_bytes()
-    if b"\x00" in raw:
-        raw = raw.replace(b"\x00", b"")
-    text: Optional[str] = None
-    for enc in ("utf-8-sig", "utf-16", "utf-16-le", "utf-16-be", "cp1252"):
-        try:
-            text = raw.decode(enc)
-            break
-        except Exception:
-            continue
-    if text is None:
-        return ""
-
-    needle = key.strip().upper()
-    for line in text.splitlines():
-        s = line.strip()
-        if not s or s.startswith("#"):
-            continue
-        if s.lower().startswith("export "):
-            s = s[7:].strip()
-
-        k = ""
-        v = ""
-        if "=" in s:
-            k, v = s.split("=", 1)
-        elif ":" in s:
-            k, v = s.split(":", 1)
-        else:
-            parts = s.split(None, 1)
-            if len(parts) == 2:
-                k, v = parts[0], parts[1]
-            else:
-                continue
-
-        kk = k.strip().lstrip("\ufeff").upper()
-        if kk != needle:
-            continue
-
-        vv = v.strip().strip("'").strip('"').strip("“").strip("”")
-        return vv
-
-    return ""
-
-
-# ---------- Configuration (env vars) ----------
-BOT_TOKEN = os.environ.get("BOT_TOKEN", "").strip()
-CHANNEL_USERNAME = os.environ.get("CHANNEL_USERNAME", "").strip()  # e.g. "SwapPilot_Official" (without @)
-GROUP_USERNAME = os.environ.get("GROUP_USERNAME", "").strip()  # optional (without @)
-GROUP_INVITE_LINK = os.environ.get("GROUP_INVITE_LINK", "").strip()  # optional if group is private
-DB_PATH = os.environ.get("DB_PATH", "").strip() or "swappilot.db"
-
-# Optional (recommended when group is private / username changes)
-CHANNEL_CHAT_ID = os.environ.get("CHANNEL_CHAT_ID", "").strip()  # e.g. -1001234567890
-GROUP_CHAT_ID = os.environ.get("GROUP_CHAT_ID", "").strip()  # e.g. -1001234567890
-
-if not BOT_TOKEN:
-    script_dir = Path(__file__).resolve().parent
-    env_path = script_dir / ".env"
-    env_txt_path = script_dir / ".env.txt"
-    env_file_token = _extract_env_value(env_path, "BOT_TOKEN")
-    env_file_token_len = len(env_file_token)
-    env_var_present = "BOT_TOKEN" in os.environ
-    env_var_len = len(os.environ.get("BOT_TOKEN", "") or "")
-    env_var_has_colon = ":" in (os.environ.get("BOT_TOKEN", "") or "")
-    env_file_has_colon = ":" in env_file_token
-    msg = (
-        "Missing BOT_TOKEN env var.\n\n"
-        "Quick fixes:\n"
-        "- Put it in .env next to swappilot_bot.py as: BOT_TOKEN=123:ABC\n"
-        "- Or in PowerShell: $env:BOT_TOKEN=\"123:ABC\" then run again\n\n"
-        "Diagnostics:\n"
-        f"- cwd: {os.getcwd()}\n"
-        f"- script_dir: {script_dir}\n"
-        f"- env BOT_TOKEN present: {env_var_present} (len={env_var_len}, contains_colon={env_var_has_colon})\n"
-        f"- .env BOT_TOKEN extracted: (len={env_file_token_len}, contains_colon={env_file_has_colon})\n"
-        f"- {_env_file_info(env_path)} (BOT_TOKEN key detected: {_env_has_key(env_path, 'BOT_TOKEN')})\n"
-        f"- {_env_file_info(env_txt_path)} (BOT_TOKEN key detected: {_env_has_key(env_txt_path, 'BOT_TOKEN')})\n"
-    )
-    raise RuntimeError(msg)
-if not CHANNEL_USERNAME and not CHANNEL_CHAT_ID:
-    raise RuntimeError(
-        "Missing CHANNEL_USERNAME or CHANNEL_CHAT_ID env var. "
-        "Example: set CHANNEL_USERNAME=SwapPilot_Official"
-    )
-
-
-def _parse_int(s: str) -> Optional[int]:
-    try:
-        return int(s)
-    except Exception:
-        return None
-
-
-CHANNEL_CHAT_ID_INT = _parse_int(CHANNEL_CHAT_ID) if CHANNEL_CHAT_ID else None
-GROUP_CHAT_ID_INT = _parse_int(GROUP_CHAT_ID) if GROUP_CHAT_ID else None
+# ---------- Logging ----------
+logger = logging.getLogger(__name__)
 
 
+# ---------- Configuration (env vars, see config.py) ----------
 def channel_ref() -> str | int:
-    return CHANNEL_CHAT_ID_INT if CHANNEL_CHAT_ID_INT is not None else f"@{CHANNEL_USERNAME}"
+    cfg = get_config()
+    return cfg.channel_chat_id if cfg.channel_chat_id is not None else f"@{cfg.channel_username}"
 
 
 def group_ref() -> Optional[str | int]:
-    if GROUP_CHAT_ID_INT is not None:
-        return GROUP_CHAT_ID_INT
-    if GROUP_USERNAME:
-        return f"@{GROUP_USERNAME}"
+    cfg = get_config()
+    if cfg.group_chat_id is not None:
+        return cfg.group_chat_id
+    if cfg.group_username:
+        return f"@{cfg.group_username}"
     return None
 
 
 def channel_url() -> str:
-    if not CHANNEL_USERNAME:
+    cfg = get_config()
+    if not cfg.channel_username:
         # No clean URL if you only provide chat_id; keep it explicit.
         return "Open the channel from Telegram search (channel username not configured)."
-    return f"https://t.me/{CHANNEL_USERNAME}"
+    return f"https://t.me/{cfg.channel_username}"
 
 
 def group_url() -> Optional[str]:
-    if GROUP_INVITE_LINK:
-        return GROUP_INVITE_LINK
-    if GROUP_USERNAME:
-        return f"https://t.me/{GROUP_USERNAME}"
+    cfg = get_config()
+    if cfg.group_invite_link:
+        return cfg.group_invite_link
+    if cfg.group_username:
+        return f"https://t.me/{cfg.group_username}"
     return None
 
 
@@ -289,24 +68,78 @@ class UserContext:
 
 
 # ---------- Database (thread-safe) ----------
-db = sqlite3.connect(DB_PATH, check_same_thread=False)
-db.execute("PRAGMA journal_mode=WAL;")
-db.execute("PRAGMA synchronous=NORMAL;")
+# Opened on first use (normally from main()), so importing this module has no side effects.
+_db: Optional[sqlite3.Connection] = None
 db_lock = threading.Lock()
 
 
-def db_exec(sql: str, params: tuple = ()) -> None:
+def get_db() -> sqlite3.Connection:
+    global _db
+    if _db is None:
+        with db_lock:
+            if _db is None:
+                _db = open_db(get_config().db_path)
+    return _db
+
+
+def open_db(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    return conn
+
+
+def close_db() -> None:
+    global _db
+    with db_lock:
+        if _db is not None:
+            _db.close()
+            _db = None
+
+
+@contextmanager
+def db_locked() -> Iterator[None]:
+    """Acquire `db_lock`, recording wait and hold time."""
+    t0 = time.perf_counter()
     with db_lock:
+        t1 = time.perf_counter()
+        metrics.db_lock_wait_ms.observe((t1 - t0) * 1000.0)
+        try:
+            yield
+        finally:
+            metrics.db_lock_hold_ms.observe((time.perf_counter() - t1) * 1000.0)
+
+
+def db_exec(sql: str, params: tuple = ()) -> None:
+    db = get_db()
+    with db_locked():
         db.execute(sql, params)
-        db.commit()
+        with metrics.timed_ms(metrics.db_commit_ms):
+            db.commit()
+
+
+def db_executemany(sql: str, rows: list[tuple]) -> None:
+    """Run `sql` for every row in a single transaction (one commit)."""
+    db = get_db()
+    with db_locked():
+        db.executemany(sql, rows)
+        with metrics.timed_ms(metrics.db_commit_ms):
+            db.commit()
 
 
 def db_query_one(sql: str, params: tuple = ()) -> Optional[tuple]:
-    with db_lock:
+    db = get_db()
+    with db_locked():
         cur = db.execute(sql, params)
         return cur.fetchone()
 
 
+def db_query_all(sql: str, params: tuple = ()) -> list[tuple]:
+    db = get_db()
+    with db_locked():
+        return db.execute(sql, params).fetchall()
+
+
 def init_db() -> None:
     db_exec(
         """
@@ -336,6 +169,7 @@ CREATE TABLE IF NOT EXISTS user_state (
 )
 """
     )
+    db_exec(RECHECK_SCHEMA)
 
 
 def set_user_state(user_id: int, start_param: str) -> None:
@@ -365,36 +199,219 @@ def log_event(user_id: int, event: str, meta: dict) -> None:
     db_exec("INSERT INTO events VALUES (?,?,?,?)", (user_id, event, json.dumps(payload), int(time.time())))
 
 
-# ---------- UI ----------
-def build_keyboard(stage: str = "landing") -> InlineKeyboardMarkup:
+# ---------- UI (pre-rendered, see ui.py) ----------
+@lru_cache(maxsize=None)
+def get_ui() -> BotUi:
+    cfg = get_config()
+    return build_ui(
+        channel_link=channel_url(),
+        group_link=group_url(),
+        group_verifiable=group_ref() is not None,
+        group_invite=bool(cfg.group_invite_link),
+        ab_versions=cfg.landing_ab_versions,
+        campaign_versions=dict(cfg.landing_campaign_versions),
+    )
+
+
+# ---------- Rate limiting ----------
+# Per-user buckets live only while a user is active; the global bucket keeps us under
+# Telegram's Bot API limits when a campaign spikes.
+@lru_cache(maxsize=None)
+def user_limiter() -> KeyedRateLimiter[int]:
+    cfg = get_config()
+    return KeyedRateLimiter(rate=cfg.rate_limit_user_per_sec, burst=cfg.rate_limit_user_burst)
+
+
+@lru_cache(maxsize=None)
+def api_limiter() -> TokenBucket:
+    cfg = get_config()
+    return TokenBucket(rate=cfg.rate_limit_api_per_sec, burst=cfg.rate_limit_api_burst)
+
+
+# Last verify result per user, replayed to throttled taps: (channel_ok, group_ok)
+last_verify: TTLCache[int, tuple[bool, Optional[bool]]] = TTLCache(max_size=100_000, ttl=600)
+
+
+def throttled_text(user_id: int, scope: str = "user") -> str:
     """
-    stage:
-      - landing: CTA -> join channel (tracked), join group (tracked), verify
-      - after_link: after we showed a link, keep verify handy
+    Short answerCallbackQuery text (<=200 chars) for a throttled tap.
+    scope "user": this user tapped too often; scope "api": the bot-wide Bot API budget is spent
+    (e.g. a campaign spike), which is not the user's fault.
     """
-    buttons: list[list[InlineKeyboardButton]] = []
+    retry = (
+        "The bot is busy right now. Please retry in a few seconds."
+        if scope == "api"
+        else "Please wait a few seconds before verifying again."
+    )
+    cached = last_verify.get(user_id)
+    if cached is None:
+        return retry if scope == "api" else "Too many taps. Please wait a few seconds and try again."
+    ok_channel, ok_group = cached
+    text = f"Last check: Channel {'✅' if ok_channel else '❌'}"
+    if ok_group is not None:
+        text += f" · Group {'✅' if ok_group else '❌'}"
+    return text + "\n" + retry
 
-    # Tracked CTAs (callbacks) so we can measure taps
-    buttons.append([InlineKeyboardButton("✅ Join the official channel", callback_data="go_channel")])
 
-    if group_url():
-        buttons.append([InlineKeyboardButton("💬 Join the community group", callback_data="go_group")])
+# ---------- Automatic rechecks (see recheck.py) ----------
+@lru_cache(maxsize=None)
+def get_recheck_queue() -> RecheckQueue:
+    return RecheckQueue(db_executemany, db_query_all, max_pending=get_config().recheck_max_pending)
 
-    buttons.append([InlineKeyboardButton("🔎 Verify access", callback_data="verify")])
-    return InlineKeyboardMarkup(buttons)
 
+# Set in post_init once the event loop runs; None when rechecks are disabled.
+_recheck_scheduler: Optional[RecheckScheduler] = None
+_recheck_task: Optional[asyncio.Task] = None
 
-LANDING_TEXT = (
-    "Welcome to SwapPilot.\n\n"
-    "⚠️ Security notice: admins will NEVER DM you first and we will NEVER ask for seed phrases, private keys, "
-    "passwords, or remote access.\n\n"
-    "1) Join the official channel\n"
-    "2) (Optional) Join the community group\n"
-    "3) Tap “Verify” to confirm access"
-)
+
+def membership_calls() -> int:
+    """get_chat_member calls per verify: channel, plus group when it is verifiable."""
+    return 1 if group_ref() is None else 2
+
+
+def recheck_requires_group() -> bool:
+    """Whether a recheck waits for the group too (opt-in: the landing copy marks the group optional)."""
+    return get_config().recheck_require_group and group_ref() is not None
+
+
+def is_confirmed(ok_channel: bool, ok_group: Optional[bool]) -> bool:
+    """Access confirmed as far as rechecks are concerned: the channel, plus the group if required."""
+    return ok_channel and (not recheck_requires_group() or bool(ok_group))
+
+
+def schedule_recheck(user_id: int, chat_id: int, message_id: int, start_param: str) -> bool:
+    """Queue the first automatic recheck. Returns False when the queue is full (job dropped)."""
+    delays = get_config().recheck_delays
+    now = time.time()
+    job = RecheckJob(user_id, chat_id, message_id, start_param, 0, now + delays[0], int(now))
+    if not get_recheck_queue().schedule(job):
+        metrics.recheck_jobs_total.labels(outcome="dropped").inc()
+        return False
+    if _recheck_scheduler is not None:
+        _recheck_scheduler.wake()
+    return True
+
+
+async def process_rechecks(bot: Bot, jobs: list[RecheckJob]) -> None:
+    """
+    Re-run membership checks for a batch of due jobs.
+    Confirmed users get their verify message edited in place; the others are re-queued with
+    the next delay until the delays run out. Each attempt checks the channel only (plus the
+    group with RECHECK_REQUIRE_GROUP); the group is looked up once the channel is confirmed, to
+    render an accurate message. A failed get_chat_member (e.g. bot not admin)
+    ends the job: retrying would fail the same way. Events, including membership failures,
+    are written in a single transaction.
+    """
+    cfg = get_config()
+    ui = get_ui()
+    queue = get_recheck_queue()
+    gref = group_ref()
+    require_group = recheck_requires_group()
+    calls_per_attempt = 2 if require_group else 1
+
+    # Rechecks spend the same global Bot API budget as manual taps; over budget, retry shortly.
+    runnable: list[RecheckJob] = []
+    retry: list[RecheckJob] = []
+    for job in jobs:
+        if api_limiter().allow(calls_per_attempt):
+            runnable.append(job)
+        else:
+            retry.append(replace(job, due_ts=time.time() + 1.0))
+
+    async def check(job: RecheckJob) -> tuple[bool, Optional[bool], list[dict]]:
+        failures: list[dict] = []
+        calls = 1
+        ok_channel = await check_membership(bot, channel_ref(), job.user_id, failures)
+        ok_group: Optional[bool] = None
+        # Group: every attempt when required, otherwise once, after the channel is confirmed.
+        if gref is not None and (require_group or ok_channel):
+            calls += 1
+            ok_group = await check_membership(bot, gref, job.user_id, failures)
+        metrics.recheck_api_calls_total.inc(calls)
+        return ok_channel, ok_group, failures
+
+    results = await asyncio.gather(*(check(job) for job in runnable))
+
+    done: list[int] = []
+    events: list[tuple] = []
+    ts = int(time.time())
+    for job, (ok_channel, ok_group, failures) in zip(runnable, results):
+        if queue.superseded(job.user_id):
+            # The user verified manually while this batch was in flight: that tap owns the result.
+            done.append(job.user_id)
+            continue
+
+        confirmed = is_confirmed(ok_channel, ok_group)
+        meta = {
+            "start_param": job.start_param,
+            "attempt": job.attempt,
+            "channel": ok_channel,
+            "group": ok_group,
+            "confirmed": confirmed,
+        }
+        events.append((job.user_id, "recheck_result", json.dumps(meta), ts))
+        for failure in failures:
+            failure = {**failure, "start_param": job.start_param}
+            events.append((job.user_id, "check_membership_failed", json.dumps(failure), ts))
+
+        if confirmed:
+            done.append(job.user_id)
+            last_verify.set(job.user_id, (ok_channel, ok_group))
+            metrics.recheck_jobs_total.labels(outcome="confirmed").inc()
+            metrics.recheck_api_calls_saved_total.inc(membership_calls())
+            try:
+                await bot.edit_message_text(
+                    chat_id=job.chat_id,
+                    message_id=job.message_id,
+                    text=ui.verify_text(ok_channel, ok_group),
+                    reply_markup=ui.keyboard("landing"),
+                )
+            except Exception as e:
+                # Message deleted, chat blocked, or already showing this text: the result is logged anyway.
+                logger.warning("recheck edit failed for user_id=%s: %s", job.user_id, e)
+        elif failures:
+            done.append(job.user_id)
+            metrics.recheck_jobs_total.labels(outcome="error").inc()
+        elif job.attempt + 1 < len(cfg.recheck_delays):
+            attempt = job.attempt + 1
+            retry.append(replace(job, attempt=attempt, due_ts=time.time() + cfg.recheck_delays[attempt]))
+            metrics.recheck_jobs_total.labels(outcome="retry").inc()
+        else:
+            done.append(job.user_id)
+            metrics.recheck_jobs_total.labels(outcome="gave_up").inc()
+
+    if events:
+        db_executemany("INSERT INTO events VALUES (?,?,?,?)", events)
+    queue.finish(done, retry)
 
 
 # ---------- Handlers ----------
+KNOWN_CALLBACKS = ("go_channel", "go_group", "verify")
+
+Handler = Callable[["Update", "ContextTypes.DEFAULT_TYPE"], Awaitable[None]]
+
+
+def instrumented(name: str) -> Callable[[Handler], Handler]:
+    """Record handler duration (per callback type) for `name`. Queue lag is observed by `metrics.TimedUpdateQueue`."""
+
+    def decorator(fn: Handler) -> Handler:
+        @wraps(fn)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            if update.callback_query:
+                data = update.callback_query.data
+                # Only known values: callback data is client-controlled and would blow up label cardinality.
+                action = data if data in KNOWN_CALLBACKS else "other"
+            else:
+                action = name
+            with metrics.timed_ms(metrics.handler_duration_ms.labels(handler=name, action=action)):
+                await fn(update, context)
+
+        return wrapper
+
+    return decorator
+
+
+@instrumented("start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Entry point. Captures ?start=... parameter for campaign tracking."""
     if not update.message:
@@ -406,94 +423,253 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     db_exec("INSERT INTO starts VALUES (?,?,?)", (user.id, start_param, int(time.time())))
     set_user_state(user.id, start_param)
     log_event(user.id, "start", {"start_param": start_param})
-    log_event(user.id, "landing_shown", {"start_param": start_param, "message_version": "v1"})
+    variant = get_ui().landing(user.id, start_param)
+    log_event(user.id, "landing_shown", {"start_param": start_param, "message_version": variant.version})
 
-    await update.message.reply_text(LANDING_TEXT, reply_markup=build_keyboard("landing"))
+    await update.message.reply_text(variant.text, reply_markup=variant.keyboard)
 
 
+@instrumented("on_button")
 async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle inline button clicks."""
     query = update.callback_query
     if not query:
         return
 
-    await query.answer()
     user_id = query.from_user.id
+
+    # Throttled taps are answered from memory only: no DB writes, no membership calls.
+    scope: Optional[str] = None
+    if not user_limiter().allow(user_id):
+        scope = "user"
+    elif query.data == "verify" and not api_limiter().allow(membership_calls()):
+        scope = "api"
+    if scope is not None:
+        metrics.throttled_total.labels(scope=scope).inc()
+        await query.answer(throttled_text(user_id, scope))
+        return
+
+    await query.answer()
     uctx = get_user_ctx(user_id)
+    ui = get_ui()
 
     if query.data == "go_channel":
         log_event(user_id, "tap_channel", {"start_param": uctx.start_param})
-        await query.edit_message_text(
-            f"Join the official channel here:\n{channel_url()}\n\nThen come back and tap Verify.",
-            reply_markup=build_keyboard("after_link"),
-        )
+        await query.edit_message_text(ui.channel_link_text, reply_markup=ui.keyboard("after_link"))
         return
 
     if query.data == "go_group":
-        link = group_url()
         log_event(user_id, "tap_group", {"start_param": uctx.start_param})
-        if not link:
-            await query.edit_message_text("Group is not configured.", reply_markup=build_keyboard("landing"))
+        if ui.group_link_text is None:
+            await query.edit_message_text(ui.group_not_configured_text, reply_markup=ui.keyboard("landing"))
             return
-        await query.edit_message_text(
-            f"Join the community group here:\n{link}\n\nThen come back and tap Verify.",
-            reply_markup=build_keyboard("after_link"),
-        )
+        await query.edit_message_text(ui.group_link_text, reply_markup=ui.keyboard("after_link"))
         return
 
     if query.data == "verify":
         log_event(user_id, "verify_click", {"start_param": uctx.start_param})
 
-        ok_channel = await check_membership(context, channel_ref(), user_id)
+        failures: list[dict] = []
+        ok_channel = await check_membership(context.bot, channel_ref(), user_id, failures)
 
         ok_group: Optional[bool] = None
         gref = group_ref()
         if gref is not None:
-            ok_group = await check_membership(context, gref, user_id)
+            ok_group = await check_membership(context.bot, gref, user_id, failures)
 
+        for failure in failures:
+            log_event(user_id, "check_membership_failed", failure)
+        last_verify.set(user_id, (ok_channel, ok_group))
         meta = {"start_param": uctx.start_param, "channel": ok_channel, "group": ok_group}
         log_event(user_id, "verify_result", meta)
 
-        msg = "Verification result:\n"
-        msg += f"- Channel: {'✅' if ok_channel else '❌'}\n"
-
-        if gref is not None:
-            msg += f"- Group: {'✅' if ok_group else '❌'}\n"
-        elif GROUP_INVITE_LINK:
-            msg += "- Group: ⚠️ Cannot auto-verify from invite link alone. Please join and come back.\n"
-        else:
-            msg += "- Group: (not configured)\n"
-
-        if not ok_channel:
-            msg += "\nTo access updates, you must join the official channel first."
-        msg += "\n\nIf you just joined, wait 5–10 seconds and try again."
+        # A manual tap supersedes any pending recheck. A clean negative result queues a fresh one;
+        # a failed check (e.g. bot not admin) would only fail again, so it is not rechecked.
+        rechecking = False
+        if get_config().recheck_delays:
+            if is_confirmed(ok_channel, ok_group) or failures or query.message is None:
+                get_recheck_queue().cancel(user_id)
+            else:
+                rechecking = schedule_recheck(
+                    user_id, query.message.chat_id, query.message.message_id, uctx.start_param
+                )
 
-        await query.edit_message_text(msg, reply_markup=build_keyboard("landing"))
+        await query.edit_message_text(
+            ui.verify_text(ok_channel, ok_group, rechecking), reply_markup=ui.keyboard("landing")
+        )
         return
 
 
-async def check_membership(context: ContextTypes.DEFAULT_TYPE, chat: str | int, user_id: int) -> bool:
+async def check_membership(bot: Bot, chat: str | int, user_id: int, failures: list[dict]) -> bool:
     """
     Returns True if the user is a member/admin/creator of the given chat (channel/group).
     Notes:
     - For channels, the bot often needs to be an administrator to reliably access membership info.
-    - If this fails, we return False and log a warning (so your stats can identify false negatives).
+    - If this fails, we return False, log a warning and append the `check_membership_failed`
+      event meta to `failures` (the caller writes it, so your stats can identify false negatives).
     """
+    chat_label = "channel" if chat == channel_ref() else "group"
+    t0 = time.perf_counter()
     try:
-        member = await context.bot.get_chat_member(chat_id=chat, user_id=user_id)
+        member = await bot.get_chat_member(chat_id=chat, user_id=user_id)
+        metrics.chat_member_duration_ms.labels(chat=chat_label, status="ok").observe(
+            (time.perf_counter() - t0) * 1000.0
+        )
         return member.status in ("member", "administrator", "creator")
     except Exception as e:
+        metrics.chat_member_duration_ms.labels(chat=chat_label, status="error").observe(
+            (time.perf_counter() - t0) * 1000.0
+        )
+        metrics.chat_member_failures_total.labels(chat=chat_label).inc()
         logger.warning("check_membership failed for chat=%s user_id=%s: %s", chat, user_id, e)
-        log_event(user_id, "check_membership_failed", {"chat": str(chat), "error": str(e)})
+        failures.append({"chat": str(chat), "error": str(e)})
         return False
 
 
-def main() -> None:
-    init_db()
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+def build_application(cfg: BotConfig) -> Application:
+    from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler
 
+    builder = ApplicationBuilder().token(cfg.bot_token).update_queue(metrics.TimedUpdateQueue())
+    if cfg.recheck_delays:
+        builder = builder.post_init(start_rechecks).post_stop(stop_rechecks)
+    app = builder.build()
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CallbackQueryHandler(on_button))
+    return app
+
+
+async def start_rechecks(app: Application) -> None:
+    """
+    post_init: restore pending rechecks and run the scheduler alongside polling.
+    A plain asyncio task (not `app.create_task`, which PTB does not track before the
+    application is running); `stop_rechecks` awaits it on post_stop.
+    """
+    global _recheck_scheduler, _recheck_task
+    queue = get_recheck_queue()
+    loaded = queue.load()
+    if loaded:
+        logger.info("Restored %d pending recheck(s)", loaded)
+    metrics.recheck_pending.set_function(lambda: len(queue))
+    _recheck_scheduler = RecheckScheduler(
+        queue,
+        lambda jobs: process_rechecks(app.bot, jobs),
+        max_attempts=len(get_config().recheck_delays),
+    )
+    _recheck_task = asyncio.create_task(_recheck_scheduler.run(), name="recheck_scheduler")
+
+
+async def stop_rechecks(app: Application, timeout: float = 10.0) -> None:
+    """post_stop: let the current batch finish (it persists its outcome), then end the loop."""
+    global _recheck_task
+    if _recheck_scheduler is None or _recheck_task is None:
+        return
+    _recheck_scheduler.stop()
+    try:
+        await asyncio.wait_for(_recheck_task, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("recheck scheduler did not stop within %.0fs; cancelled", timeout)
+    except Exception:
+        logger.exception("recheck scheduler crashed")
+    _recheck_task = None
+
+
+# ---------- Startup profile ----------
+def _import_breakdown(top: int = 15) -> list[tuple[int, int, str]]:
+    """`python -X importtime` of this module + telegram.ext in a fresh interpreter: (self_us, cumulative_us, name)."""
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = (
+        f"import sys; sys.path.insert(0, {str(Path(__file__).resolve().parent)!r}); "
+        "import swappilot_bot, telegram.ext"
+    )
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    rows: list[tuple[int, int, str]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header line
+        name = parts[2].rstrip()
+        # Only top-level imports (no nesting indentation) give a non-overlapping breakdown.
+        if name.startswith("  "):
+            continue
+        rows.append((self_us, cum_us, name.strip()))
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows[:top]
+
+
+def profile_startup() -> None:
+    """
+    Time each cold-start phase in-process, then print an importtime breakdown.
+    The SQLite phase runs against a throwaway database: DB_PATH is never opened.
+    """
+    import tempfile
+
+    global _db
+    phases: list[tuple[str, float]] = []
+
+    t0 = time.perf_counter()
+    cfg = get_config()
+    phases.append(("config (.env read + parse)", time.perf_counter() - t0))
+
+    with tempfile.TemporaryDirectory(prefix="swappilot-profile-") as tmp:
+        t0 = time.perf_counter()
+        _db = open_db(os.path.join(tmp, "profile.db"))
+        init_db()
+        phases.append(("sqlite open + schema (temp db)", time.perf_counter() - t0))
+        close_db()
+
+    t0 = time.perf_counter()
+    get_ui()
+    phases.append(("import telegram + render keyboards/messages", time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    import telegram.ext  # noqa: F401
+
+    phases.append(("import telegram.ext", time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    build_application(cfg)
+    phases.append(("ApplicationBuilder + handlers", time.perf_counter() - t0))
+
+    print("Startup phases (this process):")
+    for name, dt in phases:
+        print(f"  {dt * 1000:9.1f} ms  {name}")
+    print(f"  {sum(dt for _, dt in phases) * 1000:9.1f} ms  total")
+
+    print("\nTop-level imports (fresh interpreter, -X importtime):")
+    print(f"  {'self ms':>9} {'cumul ms':>9}  module")
+    for self_us, cum_us, name in _import_breakdown():
+        print(f"  {self_us / 1000:9.1f} {cum_us / 1000:9.1f}  {name}")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SwapPilot Telegram landing bot")
+    parser.add_argument(
+        "--profile-startup", action="store_true", help="Print a startup-time breakdown and exit (no polling)"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s | %(levelname)s | %(message)s", level=logging.INFO)
+
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    cfg = get_config()
+    init_db()
+    get_ui()  # render keyboards/messages before the first update
+    app = build_application(cfg)
+
+    metrics.update_queue_depth.set_function(app.update_queue.qsize)
+    metrics.start_server(cfg.metrics_port, cfg.metrics_addr)
 
     logger.info("Telegram landing bot started (polling)...")
     app.run_polling()
@@ -501,4 +677,3 @@ def main() -> None:
 
 if __name__ == "__main__":
     main()
-
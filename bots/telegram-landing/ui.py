@@ -0,0 +1,161 @@
+"""
+Pre-rendered UI for the Telegram landing bot.
+
+Keyboards, link messages, verify results and landing variants depend only on configuration,
+so `build_ui()` renders every one of them once at startup into an immutable `BotUi`.
+Handlers then pick a ready-made (text, keyboard) pair by key: no per-request allocation.
+
+Landing variants:
+- `LANDING_TEXTS` holds the message versions (the `message_version` tag logged on `landing_shown`).
+  Only `v1` (the original copy) ships; add approved copy under a new key to run a test.
+- `LANDING_AB_VERSIONS=v1,v2` splits users across versions (stable per user id).
+- `LANDING_CAMPAIGN_VERSIONS=ads_tg_01=v2,x_thread=v1` pins a campaign (`start_param`) to a version.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping, Optional
+
+if TYPE_CHECKING:
+    from telegram import InlineKeyboardMarkup
+
+
+STAGES = ("landing", "after_link")
+DEFAULT_MESSAGE_VERSION = "v1"
+
+_SECURITY_NOTICE = (
+    "⚠️ Security notice: admins will NEVER DM you first and we will NEVER ask for seed phrases, private keys, "
+    "passwords, or remote access."
+)
+
+LANDING_TEXTS: Mapping[str, str] = MappingProxyType(
+    {
+        "v1": (
+            "Welcome to SwapPilot.\n\n"
+            f"{_SECURITY_NOTICE}\n\n"
+            "1) Join the official channel\n"
+            "2) (Optional) Join the community group\n"
+            "3) Tap “Verify” to confirm access"
+        ),
+    }
+)
+
+
+@dataclass(frozen=True)
+class LandingVariant:
+    version: str
+    text: str
+    keyboard: InlineKeyboardMarkup
+
+
+@dataclass(frozen=True)
+class BotUi:
+    keyboards: Mapping[str, InlineKeyboardMarkup]
+    campaign_variants: Mapping[str, LandingVariant]
+    ab_variants: tuple[LandingVariant, ...]
+    channel_link_text: str
+    group_link_text: Optional[str]
+    group_not_configured_text: str
+    verify_texts: Mapping[tuple[bool, Optional[bool], bool], str]
+
+    def keyboard(self, stage: str = "landing") -> InlineKeyboardMarkup:
+        return self.keyboards[stage]
+
+    def landing(self, user_id: int, start_param: str) -> LandingVariant:
+        """Campaign-pinned variant if any, else a stable A/B bucket for this user."""
+        variant = self.campaign_variants.get(start_param)
+        if variant is not None:
+            return variant
+        return self.ab_variants[user_id % len(self.ab_variants)]
+
+    def verify_text(self, ok_channel: bool, ok_group: Optional[bool], rechecking: bool = False) -> str:
+        """`rechecking`: an automatic recheck was queued, so tell the user not to tap again."""
+        return self.verify_texts[(ok_channel, ok_group, rechecking)]
+
+
+def _build_keyboard(stage: str, has_group: bool) -> InlineKeyboardMarkup:
+    """
+    stage:
+      - landing: CTA -> join channel (tracked), join group (tracked), verify
+      - after_link: after we showed a link, keep verify handy
+    """
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+    buttons: list[list[InlineKeyboardButton]] = []
+
+    # Tracked CTAs (callbacks) so we can measure taps
+    buttons.append([InlineKeyboardButton("✅ Join the official channel", callback_data="go_channel")])
+
+    if has_group:
+        buttons.append([InlineKeyboardButton("💬 Join the community group", callback_data="go_group")])
+
+    buttons.append([InlineKeyboardButton("🔎 Verify access", callback_data="verify")])
+    return InlineKeyboardMarkup(buttons)
+
+
+def _build_verify_text(
+    ok_channel: bool, ok_group: Optional[bool], group_verifiable: bool, group_invite: bool, rechecking: bool
+) -> str:
+    msg = "Verification result:\n"
+    msg += f"- Channel: {'✅' if ok_channel else '❌'}\n"
+
+    if group_verifiable:
+        msg += f"- Group: {'✅' if ok_group else '❌'}\n"
+    elif group_invite:
+        msg += "- Group: ⚠️ Cannot auto-verify from invite link alone. Please join and come back.\n"
+    else:
+        msg += "- Group: (not configured)\n"
+
+    if not ok_channel:
+        msg += "\nTo access updates, you must join the official channel first."
+    if rechecking:
+        msg += "\n\nIf you just joined, no need to tap again: we'll re-check automatically and update this message."
+    else:
+        msg += "\n\nIf you just joined, wait 5–10 seconds and try again."
+    return msg
+
+
+def build_ui(
+    channel_link: str,
+    group_link: Optional[str],
+    group_verifiable: bool,
+    group_invite: bool,
+    ab_versions: tuple[str, ...] = (DEFAULT_MESSAGE_VERSION,),
+    campaign_versions: Mapping[str, str] = MappingProxyType({}),
+) -> BotUi:
+    """Render every keyboard and message once for this configuration."""
+    unknown = sorted({*ab_versions, *campaign_versions.values()} - set(LANDING_TEXTS))
+    if unknown:
+        raise RuntimeError(
+            f"Unknown landing message version(s): {', '.join(unknown)}. "
+            f"Available: {', '.join(LANDING_TEXTS)}"
+        )
+
+    keyboards = {stage: _build_keyboard(stage, has_group=bool(group_link)) for stage in STAGES}
+    variants = {
+        version: LandingVariant(version=version, text=text, keyboard=keyboards["landing"])
+        for version, text in LANDING_TEXTS.items()
+    }
+
+    return BotUi(
+        keyboards=MappingProxyType(keyboards),
+        campaign_variants=MappingProxyType({c: variants[v] for c, v in campaign_versions.items()}),
+        ab_variants=tuple(variants[v] for v in (ab_versions or (DEFAULT_MESSAGE_VERSION,))),
+        channel_link_text=f"Join the official channel here:\n{channel_link}\n\nThen come back and tap Verify.",
+        group_link_text=(
+            f"Join the community group here:\n{group_link}\n\nThen come back and tap Verify." if group_link else None
+        ),
+        group_not_configured_text="Group is not configured.",
+        verify_texts=MappingProxyType(
+            {
+                (ok_channel, ok_group, rechecking): _build_verify_text(
+                    ok_channel, ok_group, group_verifiable, group_invite, rechecking
+                )
+                for ok_channel in (True, False)
+                for ok_group in (True, False, None)
+                for rechecking in (False, True)
+            }
+        ),
+    )